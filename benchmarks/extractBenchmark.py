@@ -0,0 +1,79 @@
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pullData as dp
+from synthetic import boardPayload
+
+
+"""
+This script compares building the tables from board payloads with the seven
+separate *DataPull functions (each walking every payload again) against one
+pass of pullData.BoardExtractor. No API calls are made; the payloads come
+from benchmarks/synthetic.py. Run:
+
+    python benchmarks/extractBenchmark.py --cards 100000 --boards 20
+"""
+
+
+def separatePulls(board_pull):
+    """
+    Builds the tables the way main.py used to, one function per table.
+    """
+    label_frame = dp.validLabelDataPull(board_pull)
+    member_frame = dp.validMemberDataPull(board_pull)
+    return {
+        "card": dp.cardDataPull(board_pull, label_frame, member_frame),
+        "validlist": dp.validListDataPull(board_pull),
+        "validlabel": label_frame,
+        "validmember": member_frame,
+        "validfield": dp.validFieldDataPull(board_pull),
+        "field": dp.fieldDataPull(board_pull),
+        "checklist": dp.checklistDataPull(board_pull),
+    }
+
+
+def singlePass(board_pull):
+    """
+    Builds the same tables with one BoardExtractor walk per board.
+    """
+    extractor = dp.BoardExtractor()
+    for item in board_pull:
+        extractor.add_board(item)
+    return extractor.frames()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks table extraction.")
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--boards", type=int, default=20)
+    args = parser.parse_args()
+
+    board_pull = [
+        boardPayload(index, cards=args.cards // args.boards, comments=0)[0]
+        for index in range(args.boards)
+    ]
+    timings = {}
+    for name, function in [
+        ("seven *DataPull walks", separatePulls),
+        ("BoardExtractor", singlePass),
+    ]:
+        # The payloads are long lived input, keep the collector off them
+        gc.collect()
+        gc.freeze()
+        start = time.perf_counter()
+        frames = function(board_pull)
+        timings[name] = time.perf_counter() - start
+        rows = sum(len(frames[table]) for table in frames if table != "comment")
+        print("%-22s %8.2fs  %d rows" % (name, timings[name], rows))
+    print(
+        "speedup %.2fx" % (timings["seven *DataPull walks"] / timings["BoardExtractor"])
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+"""
+This script benchmarks the two ways stageData loads a staged CSV file into
+Postgres: streaming it with COPY (copy_to_postgres) and parsing it into a
+dataframe then inserting with execute_values (the readyDropboxFile and
+db_to_postgres path). Point the AWS_POSTGRES_* environment variables at a
+local scratch database and run:
+
+    python benchmarks/loadBenchmark.py --rows 200000
+
+Each method is run in its own process so their peak RSS can be compared.
+"""
+
+bench_table = "bench_card"
+
+create_table = """
+DROP TABLE IF EXISTS bench_card;
+CREATE TABLE bench_card (
+    card_id TEXT,
+    card_creation DATE,
+    card_name TEXT,
+    card_description TEXT,
+    board_id TEXT,
+    list_id TEXT,
+    card_last_active DATE,
+    label_id TEXT,
+    member_id TEXT,
+    card_number TEXT,
+    card_link TEXT,
+    card_url TEXT,
+    card_closed BOOLEAN
+);
+"""
+
+
+def cardCsv(rows):
+    """
+    Returns CSV bytes shaped like the staged cardData.csv file.
+    """
+    ids = ["%08x%016x" % (1600000000 + i, i) for i in range(rows)]
+    frame = pd.DataFrame(
+        {
+            "card_id": ids,
+            "card_creation": "2021-01-01",
+            "card_name": ["Card number %d" % i for i in range(rows)],
+            "card_description": np.where(
+                np.arange(rows) % 3 == 0, None, "Some description text " * 5
+            ),
+            "board_id": "5f0000000000000000000001",
+            "list_id": ["5f00000000000000000000%02d" % (i % 10) for i in range(rows)],
+            "card_last_active": "2021-06-01T10:00:00.000Z",
+            "label_id": "['5f0000000000000000000a01', '5f0000000000000000000a02']",
+            "member_id": "['5f0000000000000000000b01']",
+            "card_number": np.arange(rows),
+            "card_link": "abcdEFGH",
+            "card_url": "https://trello.com/c/abcdEFGH",
+            "card_closed": np.arange(rows) % 7 == 0,
+        }
+    )
+    return frame.to_csv(index=False).encode()
+
+
+def runMethod(method, rows):
+    """
+    Loads rows synthetic cards with one method and returns its measurements.
+    """
+    import stageData as sd
+
+    data = cardCsv(rows)
+    conn = sd.get_pool().getconn()
+    cursor = conn.cursor()
+    cursor.execute(create_table)
+    conn.commit()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if method == "copy":
+        sd.copy_to_postgres(io.BytesIO(data), bench_table)
+    else:
+        with io.BytesIO(data) as stream:
+            df = pd.read_csv(stream)
+            df = df.fillna(np.nan)
+            df = df.replace({np.nan: None})
+        sd.db_to_postgres(df, bench_table)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cursor.execute("SELECT COUNT(*) FROM bench_card")
+    loaded = cursor.fetchone()[0]
+    cursor.execute("DROP TABLE bench_card")
+    conn.commit()
+    cursor.close()
+    sd.get_pool().putconn(conn)
+    return {
+        "method": method,
+        "rows": loaded,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(loaded / elapsed),
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "load_rss_mb": round((rss_after - rss_before) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks COPY vs execute_values.")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--method", choices=["copy", "insert"])
+    args = parser.parse_args()
+    if args.method:
+        print(json.dumps(runMethod(args.method, args.rows)))
+        return
+    for method in ["insert", "copy"]:
+        output = subprocess.run(
+            [sys.executable, __file__, "--rows", str(args.rows), "--method", method],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            "%-7s %9d rows %8.2fs %10d rows/sec  peak RSS %7.1f MB (+%.1f MB loading)"
+            % (
+                result["method"],
+                result["rows"],
+                result["seconds"],
+                result["rows_per_sec"],
+                result["peak_rss_mb"],
+                result["load_rss_mb"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import psycopg2
+
+from stubServer import TrelloStub
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+"""
+This script runs main.py end to end without Trello, Dropbox or AWS: the API
+is benchmarks/stubServer.py (with optional latency and rate limit), staging
+is a temporary local folder and Postgres is the scratch database the
+AWS_POSTGRES_* environment variables point at. A full run is followed by
+incremental ones, each in its own process, and the end-to-end and per-stage
+throughput are read back from the run's metrics record. Run:
+
+    python benchmarks/pipelineBenchmark.py --boards 20 --cards 1000 --latency 0.05
+
+Add --shards N to run main.py with the boards split between N processes.
+
+The database only needs to be scratch: swapDatabase.sql replaces the
+public tables, and a no-op p_create_views is created if there is none.
+"""
+
+create_views = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'p_create_views') THEN
+        CREATE PROCEDURE p_create_views(schema_name TEXT)
+        LANGUAGE sql AS 'SELECT 1';
+    END IF;
+END
+$$;
+"""
+
+runner = """
+import runpy, sys
+sys.path.insert(0, sys.argv[1])
+sys.argv = ["main.py"] + sys.argv[2:]
+runpy.run_path("main.py", run_name="__main__")
+"""
+
+
+def writeConfig(folder, stub, args):
+    """
+    Writes a config.py into folder: exampleConfig.py with the API pointed at
+    the stub and every file the run keeps moved into folder.
+    """
+    with open(os.path.join(repo, "exampleConfig.py")) as file:
+        example = file.read()
+    overrides = [
+        stub.config(),
+        'stage_backend = "local"',
+        "stage_dir = %r" % os.path.join(folder, "stage"),
+        "watermark_path = %r" % os.path.join(folder, "watermarks.json"),
+        "cache_dir = %r" % os.path.join(folder, "cache"),
+        "checkpoint_dir = %r" % os.path.join(folder, "checkpoint"),
+        "metrics_path = %r" % os.path.join(folder, "metrics.jsonl"),
+        "local_log_path = None",
+        "rate_limit = %d" % (args.rate_limit or 1000000),
+        "rate_period = %r" % args.rate_period,
+    ]
+    with open(os.path.join(folder, "config.py"), "w") as file:
+        file.write(example + "\n" + "\n".join(overrides) + "\n")
+
+
+def report(record, wall, cards, stub_counts):
+    """
+    Prints the end-to-end and per-stage numbers of one run.
+    """
+    counters = record["counters"]
+    print(
+        "%s run: %.2fs wall, %.2fs in main.py, %.0f cards/s, peak RSS %s MB"
+        % (record["mode"], wall, record["seconds"], cards / wall, record["peak_rss_mb"])
+    )
+    print(
+        "  HTTP: %d requests for %d calls, %.1f MB read; stub throttled %d"
+        % (
+            counters.get("http_requests", 0),
+            counters.get("http_calls", 0),
+            counters.get("http_bytes", 0) / 1e6,
+            stub_counts["throttled"],
+        )
+    )
+    print("  %-40s %6s %9s %9s %11s" % ("stage", "calls", "seconds", "rows", "rows/s"))
+    for name, entry in sorted(
+        record["stages"].items(), key=lambda item: -item[1]["seconds"]
+    ):
+        print(
+            "  %-40s %6d %9.3f %9d %11s"
+            % (
+                name,
+                entry["calls"],
+                entry["seconds"],
+                entry["rows"],
+                entry.get("rows_per_sec", ""),
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks main.py offline.")
+    parser.add_argument("--boards", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=1000, help="per board")
+    parser.add_argument("--checklists", type=int, default=1, help="per card")
+    parser.add_argument("--comments", type=int, default=2, help="per card")
+    parser.add_argument("--custom-fields", type=int, default=4, help="per board")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int)
+    parser.add_argument("--rate-period", type=float, default=10)
+    parser.add_argument("--incremental-runs", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=1, help="main.py --shards")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=os.environ.get("AWS_POSTGRES_HOST"),
+        dbname=os.environ.get("AWS_POSTGRES_DB"),
+        user=os.environ.get("AWS_POSTGRES_USER"),
+        password=os.environ.get("AWS_POSTGRES_PW"),
+    )
+    with conn, conn.cursor() as cursor:
+        cursor.execute(create_views)
+    conn.close()
+
+    start = time.perf_counter()
+    stub = TrelloStub(
+        boards=args.boards,
+        cards=args.cards,
+        checklists=args.checklists,
+        comments=args.comments,
+        custom_fields=args.custom_fields,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        rate_period=args.rate_period,
+    )
+    stub.start()
+    print(
+        "generated %d boards x %d cards in %.1fs"
+        % (args.boards, args.cards, time.perf_counter() - start)
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        writeConfig(folder, stub, args)
+        env = dict(os.environ, DROPBOX_ACCESS=os.environ.get("DROPBOX_ACCESS", "x"))
+        shard_flags = ["--shards", str(args.shards)]
+        for flags in [["--full"]] + [[]] * args.incremental_runs:
+            flags = flags + shard_flags
+            throttled = stub.throttled
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", runner, folder] + flags,
+                cwd=repo,
+                env=env,
+                check=True,
+            )
+            wall = time.perf_counter() - start
+            with open(os.path.join(folder, "metrics.jsonl")) as file:
+                record = json.loads(file.readlines()[-1])
+            report(
+                record,
+                wall,
+                args.boards * args.cards,
+                {"throttled": stub.throttled - throttled},
+            )
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import io
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pullData as dp
+import stageData as sd
+
+
+"""
+This script times the card post-processing that used to run in
+readyDatabase.sql (four full-table UPDATEs turning the label_id/member_id
+list reprs into arrays of names, the column renames, and the card_age
+UPDATE) against loading the card table already in its final form from
+cardDataPull. Point the AWS_POSTGRES_* environment variables at a local
+scratch database and run:
+
+    python benchmarks/readyBenchmark.py --cards 100000
+
+f_get_label and f_get_member are not part of this repo, so bench_ stand-ins
+that look the ids up in validlabel/validmember style tables are used.
+"""
+
+setup = """
+DROP TABLE IF EXISTS bench_card, bench_label, bench_member;
+CREATE TABLE bench_label (label_id TEXT PRIMARY KEY, label_name TEXT);
+CREATE TABLE bench_member (member_id TEXT PRIMARY KEY, member_name TEXT);
+CREATE OR REPLACE FUNCTION bench_f_get_label(ids TEXT) RETURNS TEXT AS $$
+    SELECT array_agg(label_name)::TEXT FROM bench_label
+    WHERE label_id = ANY(ids::TEXT[])
+$$ LANGUAGE sql STABLE;
+CREATE OR REPLACE FUNCTION bench_f_get_member(ids TEXT) RETURNS TEXT AS $$
+    SELECT array_agg(member_name)::TEXT FROM bench_member
+    WHERE member_id = ANY(ids::TEXT[])
+$$ LANGUAGE sql STABLE;
+"""
+
+old_table = """
+CREATE TABLE bench_card (
+    card_id TEXT, card_creation DATE, card_name TEXT, card_description TEXT,
+    board_id TEXT, list_id TEXT, card_last_active DATE, label_id TEXT,
+    member_id TEXT, card_number TEXT, card_link TEXT, card_url TEXT,
+    card_closed BOOLEAN
+);
+"""
+
+new_table = """
+CREATE TABLE bench_card (
+    card_id TEXT, card_creation DATE, card_name TEXT, card_description TEXT,
+    board_id TEXT, list_id TEXT, card_last_active DATE, label TEXT[],
+    member TEXT[], card_number TEXT, card_link TEXT, card_url TEXT,
+    card_closed BOOLEAN, card_age INTERVAL
+);
+"""
+
+old_ready = [
+    "UPDATE bench_card SET label_id = REPLACE(REPLACE(REPLACE(REPLACE(label_id, '[', '{'),']','}'),' ',''),'''','')",
+    "UPDATE bench_card SET member_id = REPLACE(REPLACE(REPLACE(REPLACE(member_id, '[', '{'),']','}'),' ',''),'''','')",
+    "UPDATE bench_card SET label_id = bench_f_get_label(label_id)",
+    "UPDATE bench_card SET member_id = bench_f_get_member(member_id)",
+    "ALTER TABLE bench_card RENAME COLUMN label_id TO label",
+    "ALTER TABLE bench_card RENAME COLUMN member_id TO member",
+    "ALTER TABLE bench_card ADD COLUMN card_age INTERVAL NULL",
+    "UPDATE bench_card SET card_age = AGE(card_creation)",
+]
+
+
+def boardPayload(cards):
+    """
+    Returns one synthetic board payload with the given number of cards.
+    """
+    labels = [{"id": "la%022d" % i, "name": "Label %d" % i} for i in range(20)]
+    members = [{"id": "me%022d" % i, "fullName": "Member %d" % i} for i in range(30)]
+    rng = np.random.default_rng(0)
+    card_list = []
+    for i in range(cards):
+        card_list.append(
+            {
+                "id": "%08x%016x" % (1500000000 + i * 300, i),
+                "name": "Card %d" % i,
+                "desc": "",
+                "idBoard": "bo%022d" % 0,
+                "idList": "li%022d" % (i % 8),
+                "dateLastActivity": "2021-06-01T10:00:00.000Z",
+                "idLabels": [labels[j]["id"] for j in rng.choice(20, 2, False)],
+                "idMembers": [members[j]["id"] for j in rng.choice(30, 1, False)],
+                "idShort": i,
+                "shortLink": "abcdEFGH",
+                "shortUrl": "https://trello.com/c/abcdEFGH",
+                "closed": False,
+            }
+        )
+    return {
+        "id": "bo%022d" % 0,
+        "labels": labels,
+        "members": members,
+        "cards": card_list,
+    }
+
+
+def timed(cursor, statements):
+    """
+    Runs the statements and returns the seconds taken.
+    """
+    start = time.perf_counter()
+    for statement in statements:
+        cursor.execute(statement)
+    cursor.connection.commit()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times card post-processing.")
+    parser.add_argument("--cards", type=int, default=100000)
+    args = parser.parse_args()
+
+    payload = boardPayload(args.cards)
+    label_frame = pd.DataFrame(
+        {
+            "label_id": [i["id"] for i in payload["labels"]],
+            "label_name": [i["name"] for i in payload["labels"]],
+        }
+    )
+    member_frame = pd.DataFrame(
+        {
+            "member_id": [i["id"] for i in payload["members"]],
+            "member_name": [i["fullName"] for i in payload["members"]],
+        }
+    )
+    conn = sd.get_pool().getconn()
+    cursor = conn.cursor()
+    cursor.execute(setup)
+    cursor.copy_expert(
+        "COPY bench_label FROM STDIN WITH CSV",
+        io.BytesIO(label_frame.to_csv(index=False, header=False).encode()),
+    )
+    cursor.copy_expert(
+        "COPY bench_member FROM STDIN WITH CSV",
+        io.BytesIO(member_frame.to_csv(index=False, header=False).encode()),
+    )
+    conn.commit()
+
+    # Old path: list reprs loaded as text, then readied in the database
+    start = time.perf_counter()
+    old_frame = dp.cardDataPull(
+        [payload], label_frame.iloc[0:0], member_frame.iloc[0:0]
+    )
+    old_frame = old_frame.drop(columns=["label", "member", "card_age"])
+    old_frame.insert(7, "label_id", [str(i["idLabels"]) for i in payload["cards"]])
+    old_frame.insert(8, "member_id", [str(i["idMembers"]) for i in payload["cards"]])
+    old_pull = time.perf_counter() - start
+    cursor.execute(old_table)
+    conn.commit()
+    start = time.perf_counter()
+    sd.copy_to_postgres(
+        io.BytesIO(old_frame.to_csv(index=False).encode()), "bench_card"
+    )
+    old_load = time.perf_counter() - start
+    old_post = timed(cursor, old_ready)
+    cursor.execute("DROP TABLE bench_card")
+    conn.commit()
+
+    # New path: names and card_age resolved by cardDataPull
+    start = time.perf_counter()
+    new_frame = dp.cardDataPull([payload], label_frame, member_frame)
+    new_pull = time.perf_counter() - start
+    cursor.execute(new_table)
+    conn.commit()
+    start = time.perf_counter()
+    sd.copy_to_postgres(
+        io.BytesIO(sd.csv_ready(new_frame).to_csv(index=False).encode()), "bench_card"
+    )
+    new_load = time.perf_counter() - start
+
+    cursor.execute(
+        "DROP TABLE bench_card, bench_label, bench_member;"
+        + "DROP FUNCTION bench_f_get_label, bench_f_get_member;"
+    )
+    conn.commit()
+    cursor.close()
+    sd.get_pool().putconn(conn)
+
+    print("%-22s %10s %10s %10s %10s" % ("", "pull", "load", "post-load", "total"))
+    for name, pull, load, post in [
+        ("readyDatabase.sql", old_pull, old_load, old_post),
+        ("final form in Python", new_pull, new_load, 0.0),
+    ]:
+        print(
+            "%-22s %9.2fs %9.2fs %9.2fs %9.2fs"
+            % (name, pull, load, post, pull + load + post)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import boardPayload
+
+
+"""
+This script is a local stand-in for the parts of the Trello API pullData
+uses, serving synthetic boards from benchmarks/synthetic.py:
+
+    /1/organizations/{id}/boards      every board (with an ETag)
+    /1/boards/{id}                    the board payload (cards cut to card_fields)
+    /1/boards/{id}/actions            commentCard actions (limit/before/since)
+    /1/customFields/{id}/options      the options of a list field
+    /1/batch?urls=...                 up to 10 of the routes above
+
+Each request can be delayed by latency seconds, and past rate_limit
+requests in rate_period seconds a 429 with Retry-After is returned, as
+Trello does. Run it on its own to point a config.py at it:
+
+    python benchmarks/stubServer.py --boards 20 --cards 1000 --port 8000
+"""
+
+
+class TrelloStub:
+    def __init__(
+        self,
+        boards=5,
+        cards=100,
+        checklists=1,
+        checklist_items=3,
+        comments=2,
+        custom_fields=4,
+        latency=0.0,
+        rate_limit=None,
+        rate_period=10,
+        seed=0,
+    ):
+        """
+        provide the shape of the synthetic boards, the delay added to every
+        request and the requests allowed per rate_period seconds (None for
+        no limit)
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.payloads = {}
+        self.actions = {}
+        self.options = {}
+        for index in range(boards):
+            payload, actions = boardPayload(
+                index,
+                cards=cards,
+                checklists=checklists,
+                checklist_items=checklist_items,
+                comments=comments,
+                custom_fields=custom_fields,
+                seed=seed,
+            )
+            self.payloads[payload["id"]] = json.dumps(payload).encode()
+            self.actions[payload["id"]] = actions
+            for field in payload["customFields"]:
+                if "options" in field:
+                    self.options[field["id"]] = field["options"]
+        self.boards = [
+            {"id": board_id, "name": "Board %d" % index, "closed": False}
+            for index, board_id in enumerate(self.payloads)
+        ]
+        self.projected = {}
+        self.requests = 0
+        self.routes = 0
+        self.throttled = 0
+        self.bytes = 0
+        self.recent = deque()
+        self.lock = threading.Lock()
+        self.server = None
+
+    def throttle(self):
+        """
+        returns the seconds to wait if this request is over the rate limit,
+        otherwise counts it and returns None
+        """
+        with self.lock:
+            self.requests += 1
+            if self.rate_limit is None:
+                return None
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > self.rate_period:
+                self.recent.popleft()
+            if len(self.recent) >= self.rate_limit:
+                self.throttled += 1
+                return self.rate_period - (now - self.recent[0])
+            self.recent.append(now)
+            return None
+
+    def resolve(self, path):
+        """
+        returns the response body for a route (without the /1 prefix), or
+        None if there is no such route
+        """
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        with self.lock:
+            self.routes += 1
+        if parts[0] == "organizations" and parts[2:] == ["boards"]:
+            return json.dumps(self.boards).encode()
+        if parts[0] == "boards" and parts[2:] == ["actions"]:
+            actions = self.actions.get(parts[1], [])
+            if "before" in query:
+                actions = [
+                    value for value in actions if value["id"] < query["before"][0]
+                ]
+            if "since" in query:
+                actions = [
+                    value for value in actions if value["id"] > query["since"][0]
+                ]
+            return json.dumps(actions[: int(query.get("limit", ["50"])[0])]).encode()
+        if parts[0] == "boards" and len(parts) == 2:
+            if parts[1] not in self.payloads or "card_fields" not in query:
+                return self.payloads.get(parts[1])
+            return self.project(
+                parts[1],
+                query["card_fields"][0],
+                query.get("card_customFieldItems") == ["true"],
+            )
+        if parts[0] == "customFields" and parts[2:] == ["options"]:
+            if parts[1] in self.options:
+                return json.dumps(self.options[parts[1]]).encode()
+        return None
+
+    def project(self, board_id, card_fields, custom_field_items):
+        """
+        returns the payload of a board with its cards cut to card_fields (and
+        customFieldItems when asked for), as Trello does, kept for the next
+        request of the same fields
+        """
+        key = (board_id, card_fields, custom_field_items)
+        if key not in self.projected:
+            payload = json.loads(self.payloads[board_id])
+            fields = set(card_fields.split(",")) | {"id"}
+            if custom_field_items:
+                fields.add("customFieldItems")
+            payload["cards"] = [
+                {name: value for name, value in card.items() if name in fields}
+                for card in payload["cards"]
+            ]
+            self.projected[key] = json.dumps(payload).encode()
+        return self.projected[key]
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                wait = stub.throttle()
+                if wait is not None:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "%.2f" % max(wait, 0))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                time.sleep(stub.latency)
+                url = urlparse(self.path)
+                route = self.path[len("/1") :]
+                etag = None
+                if url.path == "/1/batch":
+                    answers = []
+                    for value in parse_qs(url.query)["urls"][0].split(","):
+                        body = stub.resolve(value)
+                        if body is None:
+                            answers.append(
+                                {
+                                    "name": "NotFound",
+                                    "message": value,
+                                    "statusCode": 404,
+                                }
+                            )
+                        else:
+                            answers.append({"200": json.loads(body)})
+                    body = json.dumps(answers).encode()
+                else:
+                    body = stub.resolve(route)
+                    if body is not None and url.path.startswith("/1/organizations/"):
+                        etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if etag is not None and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                with stub.lock:
+                    stub.bytes += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, port=0):
+        """
+        serves the stub on a background thread and returns its API root,
+        e.g. http://127.0.0.1:8000/1/
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base()
+
+    def base(self):
+        return "http://127.0.0.1:%d/1/" % self.server.server_port
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def config(self):
+        """
+        returns config.py lines pointing pullData at the stub
+        """
+        base = self.base()
+        return "\n".join(
+            [
+                'boardBase = "%sboards/"' % base,
+                'organizationBase = "%sorganizations/"' % base,
+                'customFieldBase = "%scustomFields/"' % base,
+                'batchBase = "%sbatch"' % base,
+                'included_org = [{"orgId": "bench", "orgName": "bench", "include": True}]',
+                "excluded_boards = []",
+                "comments_included = %r" % list(self.payloads),
+            ]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves a local Trello stand-in.")
+    parser.add_argument("--boards", type=int, default=5)
+    parser.add_argument("--cards", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    stub = TrelloStub(
+        boards=args.boards,
+        cards=args.cards,
+        comments=args.comments,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+    )
+    stub.start(args.port)
+    print(stub.config())
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
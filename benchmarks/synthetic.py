@@ -0,0 +1,173 @@
+import random
+
+
+"""
+This script generates synthetic Trello data shaped like the board payloads
+requested by pullData.boardCall and the commentCard actions returned by
+pullData.boardCommentCalls, so the pipeline can be measured without the live
+API. Ids are 24 hex characters with the creation time in the first eight,
+as Trello's are.
+"""
+
+
+def trelloId(timestamp, number):
+    """
+    Returns a Trello style id created at the unix timestamp.
+    """
+    return "%08x%016x" % (timestamp, number)
+
+
+def boardPayload(
+    index,
+    cards=100,
+    checklists=1,
+    checklist_items=3,
+    comments=2,
+    custom_fields=4,
+    seed=0,
+):
+    """
+    Returns the payload of one synthetic board and its commentCard actions
+    (newest first). Every card has checklists checklists of checklist_items
+    items and comments comments. The board has custom_fields custom fields,
+    cycling through the list, date, text and checkbox types, and card i has
+    values for the first i % (custom_fields + 1) of them.
+    """
+    rnd = random.Random(seed * 100003 + index)
+    board_id = trelloId(1500000000, index)
+    lists = [
+        {
+            "id": trelloId(1500000001, index * 100 + i),
+            "name": "List %d" % i,
+            "closed": i == 4,
+            "idBoard": board_id,
+        }
+        for i in range(5)
+    ]
+    labels = [
+        {
+            "id": trelloId(1500000002, index * 100 + i),
+            "name": "Label %d" % i,
+            "idBoard": board_id,
+            "color": ["green", "yellow", "red", "blue", "purple", None][i],
+        }
+        for i in range(6)
+    ]
+    members = [
+        {
+            "id": trelloId(1500000003, i),
+            "fullName": "Member %d" % i,
+            "username": "member%d" % i,
+        }
+        for i in range(8)
+    ]
+    field_list = []
+    for j in range(custom_fields):
+        field = {
+            "id": trelloId(1500000004, index * 100 + j),
+            "name": "Field %d" % j,
+            "idModel": board_id,
+            "type": ["list", "date", "text", "checkbox"][j % 4],
+        }
+        if field["type"] == "list":
+            field["options"] = [
+                {
+                    "_id": trelloId(1500000005, (index * 100 + j) * 10 + i),
+                    "idCustomField": field["id"],
+                    "value": {"text": "Option %d" % i},
+                    "color": "blue",
+                    "pos": i,
+                }
+                for i in range(4)
+            ]
+        field_list.append(field)
+    card_list = []
+    checklist_list = []
+    actions = []
+    for i in range(cards):
+        created = 1500000000 + index * 1000000 + i * 60
+        card_id = trelloId(created, index * 10000000 + i)
+        checklist_ids = [
+            trelloId(created + 1, (index * 10000000 + i) * 10 + j)
+            for j in range(checklists)
+        ]
+        field_values = []
+        for field in field_list[: i % (custom_fields + 1)]:
+            value = {"idCustomField": field["id"], "idModel": card_id}
+            if field["type"] == "list":
+                value["idValue"] = rnd.choice(field["options"])["_id"]
+            elif field["type"] == "date":
+                value["value"] = {"date": "2021-02-01T12:00:00.000Z"}
+            elif field["type"] == "text":
+                value["value"] = {"text": "Note on card %d" % i}
+            else:
+                value["value"] = {"checked": "true"}
+            field_values.append(value)
+        card_list.append(
+            {
+                "id": card_id,
+                "name": "Card %d" % i,
+                "desc": "Description of card %d. " % i * rnd.randint(0, 6),
+                "idBoard": board_id,
+                "idList": rnd.choice(lists)["id"],
+                "idLabels": [value["id"] for value in rnd.sample(labels, i % 3)],
+                "idMembers": [value["id"] for value in rnd.sample(members, i % 2)],
+                "closed": i % 10 == 0,
+                "dateLastActivity": "2021-%02d-%02dT10:00:00.000Z"
+                % (1 + i % 12, 1 + i % 28),
+                "idShort": i + 1,
+                "shortLink": "sl%06d" % i,
+                "shortUrl": "https://trello.com/c/sl%06d" % i,
+                "idChecklists": checklist_ids,
+                "checkItemStates": [],
+                "customFieldItems": field_values,
+            }
+        )
+        for j, checklist_id in enumerate(checklist_ids):
+            checklist_list.append(
+                {
+                    "id": checklist_id,
+                    "name": "Checklist %d.%d" % (i, j),
+                    "idCard": card_id,
+                    "idBoard": board_id,
+                    "checkItems": [
+                        {
+                            "id": trelloId(
+                                created + 2,
+                                (index * 100000000 + i * 100 + k) * 10 + j,
+                            ),
+                            "idChecklist": checklist_id,
+                            "state": rnd.choice(["complete", "incomplete"]),
+                            "name": "Item %d" % k,
+                            "idMember": rnd.choice([None, members[k % 8]["id"]]),
+                        }
+                        for k in range(checklist_items)
+                    ],
+                }
+            )
+        for k in range(comments):
+            actions.append(
+                {
+                    "id": trelloId(created + 10 + k, index * 100000000 + i * 100 + k),
+                    "idMemberCreator": rnd.choice(members)["id"],
+                    "type": "commentCard",
+                    "date": "2021-03-01T10:00:00.000Z",
+                    "data": {
+                        "text": "Comment %d on card %d" % (k, i),
+                        "card": {"id": card_id},
+                        "board": {"id": board_id},
+                    },
+                }
+            )
+    actions.sort(key=lambda action: action["id"], reverse=True)
+    payload = {
+        "id": board_id,
+        "name": "Board %d" % index,
+        "cards": card_list,
+        "checklists": checklist_list,
+        "lists": lists,
+        "labels": labels,
+        "members": members,
+        "customFields": field_list,
+    }
+    return payload, actions
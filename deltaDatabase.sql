@@ -0,0 +1,43 @@
+DROP TABLE IF EXISTS validboard_delta;
+
+DROP TABLE IF EXISTS card_delta;
+
+DROP TABLE IF EXISTS comment_delta;
+
+DROP TABLE IF EXISTS checklist_delta;
+
+DROP TABLE IF EXISTS field_delta;
+
+DROP TABLE IF EXISTS validfieldoption_delta;
+
+DROP TABLE IF EXISTS validfield_delta;
+
+DROP TABLE IF EXISTS validlabel_delta;
+
+DROP TABLE IF EXISTS validlist_delta;
+
+DROP TABLE IF EXISTS validmember_delta;
+
+ALTER TABLE comment ADD COLUMN IF NOT EXISTS comment_id TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS comment_comment_id_key ON comment (comment_id);
+
+CREATE UNLOGGED TABLE validboard_delta (LIKE validboard);
+
+CREATE UNLOGGED TABLE card_delta (LIKE card);
+
+CREATE UNLOGGED TABLE comment_delta (LIKE comment);
+
+CREATE UNLOGGED TABLE checklist_delta (LIKE checklist);
+
+CREATE UNLOGGED TABLE field_delta (LIKE field);
+
+CREATE UNLOGGED TABLE validfieldoption_delta (LIKE validfieldoption);
+
+CREATE UNLOGGED TABLE validfield_delta (LIKE validfield);
+
+CREATE UNLOGGED TABLE validlabel_delta (LIKE validlabel);
+
+CREATE UNLOGGED TABLE validlist_delta (LIKE validlist);
+
+CREATE UNLOGGED TABLE validmember_delta (LIKE validmember);
\ No newline at end of file
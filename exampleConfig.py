@@ -59,3 +59,130 @@ customFieldParams = "/customFields?fields=id,name,idModel,type"
 cardsParams = "/cards?fields=id,name,idBoard,closed,dateLastActivity,idLabels,idList,idMembers,idShort,shortLink,shortUrl&filter=all"
 checklistParams = "/?fields=name&checklists=all&checklist_fields=id,name,idCard,idBoard&checkItem_fields=name"
 customFieldBase = "https://api.trello.com/1/customFields/"
+batchBase = "https://api.trello.com/1/batch"
+
+"""
+This is the number of boards fetched at the same time by fromBoardPull. Keep
+it modest as every worker counts against the Trello rate limit for the token.
+"""
+board_workers = 8
+
+"""
+This is how many worker processes the boards are split between, so parsing
+and extracting large boards uses more than one core (main.py --shards
+overrides it). Each gets a share of rate_limit and runs board_workers
+threads. 1 pulls every board in the main process.
+"""
+shards = 1
+
+"""
+This is the folder board payloads and comment pages are checkpointed in as
+they are fetched, so main.py --resume can carry on after a failed run. It is
+emptied once a run loads, or None to keep no checkpoints.
+"""
+checkpoint_dir = "trello_checkpoint"
+
+"""
+These are the columns, per table, left empty because no view uses them. The
+board call does not request their Trello fields (see table_fields in
+pullData.py), so payloads are smaller. Key columns (the ids and the columns
+upsertDatabase.sql merges on) cannot be skipped; the others load as NULL.
+"""
+skipped_columns = {}
+
+"""
+This is the most characters of each card description kept, or None to keep
+them whole. board_description_lengths sets it per board id; 0 does not
+request that board's descriptions at all.
+"""
+description_length = None
+board_description_lengths = {}
+
+"""
+This is the page size used when pulling comments at the board level. Trello
+caps the actions endpoint at 1000 per request.
+"""
+comment_page_limit = 1000
+
+"""
+This is the local file holding the per board high-water marks used by the
+incremental pull. Deleting it (or running main.py --full) forces a full
+refresh.
+"""
+watermark_path = "watermarks.json"
+
+"""
+These control the shared Trello client. Trello allows 100 requests per 10
+seconds for each token; calls are throttled to rate_limit per rate_period
+seconds. Calls that time out after request_timeout seconds, or come back
+429 or 5xx, are retried up to max_retries times with backoff.
+"""
+rate_limit = 100
+rate_period = 10
+request_timeout = 30
+max_retries = 5
+
+"""
+This is how staged files are loaded into Postgres. "copy" streams the CSV
+files in with COPY; "insert" falls back to reading them into dataframes and
+inserting with execute_values.
+"""
+load_method = "copy"
+
+"""
+This is where staged files are kept: "dropbox" or "local" (a folder at
+stage_dir, useful for testing). With direct_load the data is loaded into
+Postgres straight from memory and the staged files upload in the background
+as a fallback copy instead of being read back before loading.
+"""
+stage_backend = "dropbox"
+stage_dir = "staging"
+direct_load = True
+
+"""
+This is the format staged snapshots are written in: "parquet" (zstd
+compressed, with a fixed schema per table, needs pyarrow) or "csv".
+"""
+snapshot_format = "parquet"
+snapshot_compression = "zstd"
+
+"""
+This is the number of Postgres connections kept in the pool, which is also
+how many tables are loaded at the same time.
+"""
+pool_size = 4
+
+"""
+This is the folder API responses are cached in between runs, or None to turn
+the cache off. Responses Trello sends an ETag or Last-Modified for are asked
+for again with If-None-Match/If-Modified-Since and reused on a 304; custom
+field options are reused without asking for option_ttl seconds. Past
+cache_size bytes the least recently used responses are dropped.
+"""
+cache_dir = "trello_cache"
+cache_size = 50 * 1024 * 1024
+option_ttl = 24 * 60 * 60
+
+"""
+This is the file each run appends its metrics record to (stage timings,
+rows, HTTP requests and bytes, peak memory) as one JSON line. Setting
+prometheus_path also writes the latest run in Prometheus text format there.
+A stage taking more than slower_factor times its median over the last
+slower_runs runs (and at least slower_min_seconds) is logged.
+"""
+metrics_path = "metrics.jsonl"
+prometheus_path = None
+slower_factor = 2
+slower_runs = 7
+slower_min_seconds = 1
+
+"""
+The run log lines are kept in memory and added to /ETL_log/trello_log.txt in
+the staging environment once, at the end of the run. Past log_max_bytes the
+file is rotated, keeping log_backups numbered copies. The lines are also
+written as they happen to local_log_path (rotated the same way), or nowhere
+locally if it is None.
+"""
+log_max_bytes = 1024 * 1024
+log_backups = 5
+local_log_path = "trello_log.txt"
@@ -1,3 +1,5 @@
+import argparse
+import metrics
 import stageData as sd
 import pullData as dp
 
@@ -10,11 +12,55 @@ new data to database, and readying the database for users.
 Steps running:
 1. pullData.py --> extracts and processes data from Trello API
 2. stageData.py --> loads processed data pull into Dropbox
-3. stageDatabase.sql --> drops db tables and adds them back
+3. stageDatabase.sql --> builds empty tables in the trello_shadow schema
 4. loadData.py --> loads data from Dropbox staging environment into Postgres db
-5. readyDatabase.sql --> creates db views and grants access readying db for use
+5. readyDatabase.sql --> readies the shadow tables for use
+6. swapDatabase.sql --> swaps the shadow tables in and creates the db views
+
+With direct_load set in config.py step 2 uploads in the background and step 4
+copies the data already in memory, so the files are not read back.
+
+By default only cards and comments that changed since the last run (per the
+board watermarks in config.watermark_path) are pulled. They are loaded into
+the *_delta tables from deltaDatabase.sql and merged into the live tables by
+upsertDatabase.sql in place of steps 3, 5 and 6. The first run, or a run with
+--full, does the full refresh above. The merge keeps card_age current by
+updating only the cards whose stored age no longer equals AGE(card_creation).
+
+Board payloads and comment pages are checkpointed to config.checkpoint_dir as
+they are fetched. After a failed run, main.py --resume reuses them and only
+fetches what is missing.
 """
 
+parser = argparse.ArgumentParser(description="Runs the Trello ETL.")
+parser.add_argument(
+    "--full",
+    action="store_true",
+    help="drop and reload every table instead of pulling only changed cards",
+)
+parser.add_argument(
+    "--shards",
+    type=int,
+    default=dp.shards,
+    help="pull and extract the boards in this many worker processes",
+)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="reuse the boards and comments checkpointed by a failed run",
+)
+args = parser.parse_args()
+
+"""
+Unless resuming, the checkpoints of an earlier failed run are dropped so
+every board and comment is fetched again.
+"""
+if not args.resume:
+    dp.checkpoint.clear()
+
+watermarks = {} if args.full else dp.loadWatermarks()
+incremental = bool(watermarks)
+
 """
 Inserting start time of ETL into log file.
 """
@@ -27,18 +73,26 @@ Importing the functions from pullData to be used in this script.
 try:
     board = dp.collectBoards(orgs=dp.included_org)
     include_board = board[board["board_included"] == True]
-    comment_included = include_board[include_board["board_comment"] == True]
-    brd_pll = dp.fromBoardPull(include_board)
-    comment_pll = dp.fromBoardPull(comment_included)
-    comment_data = dp.commentDataPull(comment_pll)
-    card_data = dp.cardDataPull(brd_pll)
-    list_data = dp.validListDataPull(brd_pll)
-    label_data = dp.validLabelDataPull(brd_pll)
-    member_data = dp.validMemberDataPull(brd_pll)
-    validField_data = dp.validFieldDataPull(brd_pll)
-    field_data = dp.fieldDataPull(brd_pll)
-    checklist_data = dp.checklistDataPull(brd_pll)
-    validFieldOption_data = dp.validFieldOptionDataPull(validField_data)
+    if args.shards > 1:
+        board_data = dp.shardedDataPull(include_board, watermarks, args.shards)
+    else:
+        board_data = dp.streamDataPull(include_board, watermarks)
+    comment_data = board_data["comment"]
+    list_data = board_data["validlist"]
+    label_data = board_data["validlabel"]
+    member_data = board_data["validmember"]
+    card_data = board_data["card"]
+    validField_data = board_data["validfield"]
+    field_data = board_data["field"]
+    checklist_data = board_data["checklist"]
+    validFieldOption_data = board_data["validfieldoption"]
+    if args.resume:
+        resumed = "Resumed %d boards and %d comment pages from checkpoints." % (
+            metrics.counters.get("checkpoint_boards", 0),
+            metrics.counters.get("checkpoint_comment_pages", 0),
+        )
+        sd.update_log("start", resumed)
+    sd.update_log("start", "Table memory: " + dp.memorySummary())
 except Exception as err:
     trello_error = (
         "Looks like there was an error with one of the data pulls from Trello."
@@ -49,23 +103,34 @@ except Exception as err:
 else:
     """
     Data dictionary is created to be used downstream containing the database table
-    name (key), the dropbox file path (index 0), and the dataPull function
-    (index 1).
+    name (key), the dropbox file path (index 0, a Parquet or CSV snapshot per
+    sd.snapshot_format), and the dataPull function (index 1). Incremental runs
+    load into the *_delta tables and stage their files under /delta so the last
+    full snapshot in Dropbox is kept. Full runs load into the trello_shadow
+    schema built by stageDatabase.sql.
     """
+    ext = sd.snapshot_extension
     data_dict = dict(
         {
-            "validboard": ["/validBoardData.csv", board],
-            "card": ["/cardData.csv", card_data],
-            "checklist": ["/checklistData.csv", checklist_data],
-            "comment": ["/commentData.csv", comment_data],
-            "field": ["/fieldData.csv", field_data],
-            "validfield": ["/validFieldData.csv", validField_data],
-            "validfieldoption": ["/validFieldOptionData.csv", validFieldOption_data],
-            "validlabel": ["/validLabelData.csv", label_data],
-            "validlist": ["/validListData.csv", list_data],
-            "validmember": ["/validMemberData.csv", member_data],
+            "validboard": ["/validBoardData" + ext, board],
+            "card": ["/cardData" + ext, card_data],
+            "checklist": ["/checklistData" + ext, checklist_data],
+            "comment": ["/commentData" + ext, comment_data],
+            "field": ["/fieldData" + ext, field_data],
+            "validfield": ["/validFieldData" + ext, validField_data],
+            "validfieldoption": ["/validFieldOptionData" + ext, validFieldOption_data],
+            "validlabel": ["/validLabelData" + ext, label_data],
+            "validlist": ["/validListData" + ext, list_data],
+            "validmember": ["/validMemberData" + ext, member_data],
         }
     )
+    if incremental:
+        data_dict = {
+            key + "_delta": ["/delta" + value[0], value[1]]
+            for key, value in data_dict.items()
+        }
+    else:
+        data_dict = {"trello_shadow." + key: value for key, value in data_dict.items()}
 
 
 """
@@ -80,7 +145,10 @@ except Exception as err:
     )
     sd.update_log("start", error_message)
 else:
-    sd.runScriptSQL("stageDatabase.sql")
+    if incremental:
+        sd.runScriptSQL("deltaDatabase.sql")
+    else:
+        sd.runScriptSQL("stageDatabase.sql")
     message = "Data pull is complete and database has been staged."
     sd.update_log("start", message)
 
@@ -88,10 +156,15 @@ else:
 Once the data is staged in dropbox and the database has been staged, the data
 is then readied and ingested into the db. Errors are logged. Barring any,
 errors, the next step is to call some custom functions and stored procedure
-to ready the database for the users.
+to ready the database for the users. A full run readies the trello_shadow
+schema and then swapDatabase.sql moves its tables over the live ones in a
+single transaction, so readers never see empty tables and a failed run
+leaves the previous data in place. An incremental run only merges the delta
+tables once all of them have loaded, so a partial delta never reaches the
+live tables.
 """
 try:
-    sd.load_data_db(data_dict)
+    failed = sd.load_data_db(data_dict)
 except Exception as err:
     error_message = (
         "ERROR: load_data_db() failed to run successfully." + "\r\n" + str(err)
@@ -99,10 +172,65 @@ except Exception as err:
     sd.update_log("start", error_message)
 else:
     try:
-        sd.runScriptSQL("readyDatabase.sql")
+        if failed == 0 and incremental:
+            sd.runScriptSQL("upsertDatabase.sql")
+        elif failed == 0:
+            sd.runScriptSQL("readyDatabase.sql")
+            sd.runScriptSQL("swapDatabase.sql")
+        else:
+            error_message = (
+                "ERROR: "
+                + str(failed)
+                + " table(s) failed to load, the live tables were kept."
+            )
+            sd.update_log("start", error_message)
     except Exception as err:
         error_message = "ERROR: SQL script failed to run." + "\r\n" + str(err)
         sd.update_log("start", error_message)
+    else:
+        """
+        Watermarks are only moved forward, and the checkpoints dropped, once
+        every table has loaded so a failed run is picked up again by the
+        next one.
+        """
+        if failed == 0:
+            dp.saveWatermarks(watermarks)
+            dp.checkpoint.clear()
+
+"""
+Waiting on the staging snapshots still uploading in the background.
+"""
+sd.finish_uploads()
+
+"""
+Saving the Trello response cache for the next run and logging how many of the
+calls it answered, and how many HTTP requests the rest took once batched.
+"""
+if dp.client.cache is not None:
+    dp.client.cache.save()
+    sd.update_log("start", "Trello response cache: " + dp.client.cache.summary())
+sd.update_log("start", "Trello calls: " + dp.client.summary())
+
+"""
+Appending this run's metrics record to config.metrics_path, with the Trello
+client's counters, and logging any stage that took much longer than usual.
+"""
+metrics.count("http_requests", dp.client.counter)
+metrics.count("http_calls", dp.client.routes)
+metrics.count("http_bytes", dp.client.bytes)
+metrics.count("frame_bytes", sum(value[0] for value in dp.frame_memory.values()))
+metrics.count(
+    "frame_bytes_compact", sum(value[1] for value in dp.frame_memory.values())
+)
+if dp.client.cache is not None:
+    metrics.count("cache_fresh", dp.client.cache.hits)
+    metrics.count("cache_revalidated", dp.client.cache.revalidated)
+    metrics.count("cache_missed", dp.client.cache.misses)
+run_record = metrics.run_record("incremental" if incremental else "full")
+slower = metrics.slower_stages(run_record)
+if slower:
+    sd.update_log("start", "Slower than usual: " + ", ".join(slower))
+metrics.write(run_record)
 
 """
 Inserting end time of ETL into log file.
@@ -0,0 +1,240 @@
+import config
+import contextlib
+import datetime
+import functools
+import json
+import os
+import statistics
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+"""
+This script holds the run metrics. Pull and load functions are wrapped with
+timed (or a stage block) so each run records, per stage, how often it ran,
+the seconds it took, the rows it produced and the peak memory so far, along
+with counters such as HTTP requests and bytes. main.py appends one JSON
+record per run to metrics_path, so runs can be compared over time, and can
+also write them in Prometheus text format to prometheus_path.
+"""
+
+metrics_path = getattr(config, "metrics_path", "metrics.jsonl")
+prometheus_path = getattr(config, "prometheus_path", None)
+
+"""
+A stage that takes more than slower_factor times its median over the last
+slower_runs runs of the same mode is reported by slower_stages, unless it
+still took under slower_min_seconds.
+"""
+slower_factor = getattr(config, "slower_factor", 2)
+slower_runs = getattr(config, "slower_runs", 7)
+slower_min_seconds = getattr(config, "slower_min_seconds", 1)
+
+"""
+The stages and counters recorded so far this run. Stages are timed from the
+pull and loader threads, so updates take the lock.
+"""
+run_start = time.time()
+stages = {}
+counters = {}
+lock = threading.Lock()
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of the process so far in MB, or None
+    where the resource module is missing (Windows).
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def count_rows(result):
+    """
+    Returns the rows in a function result: the length of a dataframe or
+    list, or the total over a dictionary of dataframes. Anything else
+    counts as no rows.
+    """
+    if isinstance(result, dict):
+        return sum(len(value) for value in result.values() if hasattr(value, "columns"))
+    if isinstance(result, list) or hasattr(result, "columns"):
+        return len(result)
+    return 0
+
+
+def add_stage(name, seconds, rows=0):
+    """
+    Adds a run of the named stage. Repeated runs (e.g. one per board) are
+    summed into the same stage.
+    """
+    with lock:
+        entry = stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["rows"] += rows
+        entry["peak_rss_mb"] = peak_rss_mb()
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Times the with block as the named stage. The block can set "rows" in the
+    dictionary it is given to record the rows it produced.
+    """
+    record = {"rows": 0}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        add_stage(name, time.perf_counter() - start, record["rows"])
+
+
+def timed(function):
+    """
+    Decorator timing every call of the function as a stage named after it,
+    with the rows counted from what it returns by count_rows.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with stage(function.__qualname__) as record:
+            result = function(*args, **kwargs)
+            record["rows"] = count_rows(result)
+        return result
+
+    return wrapper
+
+
+def count(name, value=1):
+    """
+    Adds value to the named counter, e.g. the bytes staged.
+    """
+    with lock:
+        counters[name] = counters.get(name, 0) + value
+
+
+def merge(other_stages, other_counters):
+    """
+    Adds the stages and counters recorded by a worker process (see
+    pullData.shardedDataPull) to this run's. Seconds are summed across
+    processes, so a stage run by several at once can exceed the run's time.
+    """
+    with lock:
+        for name, other in other_stages.items():
+            entry = stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0})
+            entry["calls"] += other["calls"]
+            entry["seconds"] += other["seconds"]
+            entry["rows"] += other["rows"]
+            entry["peak_rss_mb"] = max(
+                entry.get("peak_rss_mb") or 0, other.get("peak_rss_mb") or 0
+            )
+        for name, value in other_counters.items():
+            counters[name] = counters.get(name, 0) + value
+
+
+def run_record(mode):
+    """
+    Returns the metrics record of this run so far. mode ("full" or
+    "incremental") is kept so runs are only compared with their own kind.
+    """
+    with lock:
+        record_stages = {}
+        for name, entry in stages.items():
+            entry = dict(entry, seconds=round(entry["seconds"], 3))
+            if entry["rows"] and entry["seconds"]:
+                entry["rows_per_sec"] = round(entry["rows"] / entry["seconds"], 1)
+            record_stages[name] = entry
+        return {
+            "run": datetime.datetime.fromtimestamp(run_start).isoformat(),
+            "mode": mode,
+            "seconds": round(time.time() - run_start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "counters": dict(counters),
+            "stages": record_stages,
+        }
+
+
+def load_history(path=None):
+    """
+    Returns the records of earlier runs from metrics_path, oldest first.
+    """
+    path = path or metrics_path
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def slower_stages(record, path=None):
+    """
+    Returns a description of each stage in record (and the run as a whole)
+    that took more than slower_factor times its median over the last
+    slower_runs earlier runs of the same mode, and at least
+    slower_min_seconds.
+    """
+    history = [run for run in load_history(path) if run["mode"] == record["mode"]]
+    history = history[-slower_runs:]
+    if not history:
+        return []
+    timings = {"run": (record["seconds"], [run["seconds"] for run in history])}
+    for name, entry in record["stages"].items():
+        earlier = [
+            run["stages"][name]["seconds"] for run in history if name in run["stages"]
+        ]
+        if earlier:
+            timings[name] = (entry["seconds"], earlier)
+    slower = []
+    for name, (seconds, earlier) in timings.items():
+        median = statistics.median(earlier)
+        if seconds >= slower_min_seconds and seconds > slower_factor * median:
+            slower.append("%s %.1fs (median %.1fs)" % (name, seconds, median))
+    return slower
+
+
+def prometheus_text(record):
+    """
+    Returns the record in the Prometheus text exposition format, e.g. for
+    the node_exporter textfile collector.
+    """
+    lines = [
+        "# TYPE trello_etl_run_seconds gauge",
+        "trello_etl_run_seconds %s" % record["seconds"],
+    ]
+    if record["peak_rss_mb"] is not None:
+        lines.append("# TYPE trello_etl_peak_rss_bytes gauge")
+        lines.append(
+            "trello_etl_peak_rss_bytes %d" % (record["peak_rss_mb"] * 1024 * 1024)
+        )
+    for name, value in sorted(record["counters"].items()):
+        lines.append("# TYPE trello_etl_%s gauge" % name)
+        lines.append("trello_etl_%s %s" % (name, value))
+    for field in ["seconds", "rows", "calls"]:
+        lines.append("# TYPE trello_etl_stage_%s gauge" % field)
+        for name, entry in sorted(record["stages"].items()):
+            lines.append(
+                'trello_etl_stage_%s{stage="%s",mode="%s"} %s'
+                % (field, name, record["mode"], entry[field])
+            )
+    return "\n".join(lines) + "\n"
+
+
+def write(record):
+    """
+    Appends the record to metrics_path as one JSON line and, when
+    prometheus_path is set, replaces that file with the record in
+    Prometheus text format.
+    """
+    with open(metrics_path, "a") as file:
+        file.write(json.dumps(record) + "\n")
+    if prometheus_path is not None:
+        # Written aside and renamed so a scrape never sees half a file
+        with open(prometheus_path + ".tmp", "w") as file:
+            file.write(prometheus_text(record))
+        os.replace(prometheus_path + ".tmp", prometheus_path)
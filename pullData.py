@@ -1,9 +1,29 @@
 import os
+import json
+import hashlib
+import random
+import threading
+import time
+import datetime
 import requests
+import urllib3
 import config
+import metrics
 import pandas as pd
 import re
 import numpy as np
+import collections
+import itertools
+import multiprocessing
+import shutil
+from operator import itemgetter
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 """
@@ -23,48 +43,772 @@ excluded_boards = config.excluded_boards
 comments_included = config.comments_included
 included_org = config.included_org
 customFieldBase = config.customFieldBase
+batchBase = getattr(config, "batchBase", "https://api.trello.com/1/batch")
+board_workers = getattr(config, "board_workers", 8)
+comment_page_limit = getattr(config, "comment_page_limit", 1000)
+watermark_path = getattr(config, "watermark_path", "watermarks.json")
+rate_limit = getattr(config, "rate_limit", 100)
+rate_period = getattr(config, "rate_period", 10)
+request_timeout = getattr(config, "request_timeout", 30)
+max_retries = getattr(config, "max_retries", 5)
+cache_dir = getattr(config, "cache_dir", "trello_cache")
+cache_size = getattr(config, "cache_size", 50 * 1024 * 1024)
+option_ttl = getattr(config, "option_ttl", 24 * 60 * 60)
+shards = getattr(config, "shards", 1)
+checkpoint_dir = getattr(config, "checkpoint_dir", "trello_checkpoint")
+skipped_columns = getattr(config, "skipped_columns", {})
+description_length = getattr(config, "description_length", None)
+board_description_lengths = getattr(config, "board_description_lengths", {})
+
+"""
+The errors of a connection that fails or drops before the whole body is
+read; request retries them. A streamed body is read after the request
+returns, so urllib3 raises its own errors for it.
+"""
+dropped_errors = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+)
+
+"""
+Calls made through the batch endpoint are given relative to apiBase, and
+Trello takes at most batch_size of them per batch request.
+"""
+apiBase = batchBase[: -len("batch")]
+batch_size = 10
+
+"""
+The columns of each table, in table order, and the field of the board
+payload each is read from: a field of the card, label, list or member named
+in table_objects, or of the checklist. None marks columns that are derived
+(e.g. card_age) or come from elsewhere. Columns listed in skipped_columns in
+config.py are left empty, and their fields are not requested unless the
+pull itself needs them (required_fields).
+"""
+table_fields = {
+    "card": {
+        "card_id": "id",
+        "card_creation": None,
+        "card_name": "name",
+        "card_description": "desc",
+        "board_id": "idBoard",
+        "list_id": "idList",
+        "card_last_active": "dateLastActivity",
+        "label": "idLabels",
+        "member": "idMembers",
+        "card_number": "idShort",
+        "card_link": "shortLink",
+        "card_url": "shortUrl",
+        "card_closed": "closed",
+        "card_age": None,
+    },
+    "checklist": {
+        "checklist_id": "id",
+        "item_state": None,
+        "item_id": None,
+        "item_name": None,
+        "item_member": None,
+        "checklist_name": "name",
+        "card_id": "idCard",
+        "board_id": "idBoard",
+    },
+    "comment": {
+        "card_id": None,
+        "member_id": None,
+        "card_comment": None,
+        "comment_date": None,
+        "comment_id": None,
+    },
+    "field": {
+        "field_id": None,
+        "card_id": None,
+        "field_text": None,
+        "field_value_id": None,
+        "field_date": None,
+        "field_checked": None,
+    },
+    "validfield": {
+        "field_id": None,
+        "field_name": None,
+        "board_id": None,
+        "field_type": None,
+    },
+    "validlabel": {
+        "label_id": "id",
+        "label_name": "name",
+        "board_id": "idBoard",
+        "label_color": "color",
+    },
+    "validlist": {
+        "list_id": "id",
+        "list_name": "name",
+        "board_id": "idBoard",
+        "list_closed": "closed",
+    },
+    "validmember": {
+        "member_id": "id",
+        "member_name": "fullName",
+        "member_username": "username",
+    },
+    "validfieldoption": {
+        "field_option_id": None,
+        "field_option_value": None,
+        "field_option_color": None,
+    },
+}
+table_columns = {table: list(fields) for table, fields in table_fields.items()}
+table_objects = {
+    "card": "card",
+    "validlabel": "label",
+    "validlist": "list",
+    "validmember": "member",
+}
+required_fields = {
+    "card": ["id", "dateLastActivity"],
+    "label": ["id", "name"],
+    "list": ["id"],
+    "member": ["id", "fullName"],
+}
+"""
+Columns besides the Trello ids that upsertDatabase.sql merges the delta
+tables on, as a conflict key or the card_id of the rows it replaces. Like
+the ids, they cannot be skipped, or incremental runs would duplicate rows.
+"""
+key_columns = {
+    "checklist": ["card_id"],
+    "comment": ["comment_id"],
+    "field": ["card_id"],
+    "validfield": ["field_id"],
+    "validfieldoption": ["field_option_id"],
+}
+
+for table, columns in skipped_columns.items():
+    for column in columns:
+        if column not in table_fields.get(table, {}):
+            raise ValueError("skipped_columns: %s has no column %s" % (table, column))
+        if table_fields[table][column] == "id" or column in key_columns.get(table, ()):
+            raise ValueError("skipped_columns: %s.%s is a key" % (table, column))
+
+
+def boardQuery(descriptions=True):
+    """
+    Returns the params of the board call: every object of table_objects
+    with the fields of its columns that are not skipped, plus its
+    required_fields. Card descriptions are left out unless descriptions.
+    """
+    fields = {name: list(value) for name, value in required_fields.items()}
+    for table, name in table_objects.items():
+        for column, field in table_fields[table].items():
+            if field is None or column in skipped_columns.get(table, ()):
+                continue
+            if field == "desc" and not descriptions:
+                continue
+            if field not in fields[name]:
+                fields[name].append(field)
+    return (
+        "/?fields=name&checklists=all"
+        + "&members=all&member_fields="
+        + ",".join(fields["member"])
+        + "&labels=all&label_fields="
+        + ",".join(fields["label"])
+        + "&lists=all&list_fields="
+        + ",".join(fields["list"])
+        + "&cards=all&card_fields="
+        + ",".join(fields["card"])
+        + "&customFields=true&card_customFieldItems=true"
+    )
+
+
+def objectRow(element, table, *exclude):
+    """
+    Returns the columns of a table read from one object of the board payload
+    by their fields in table_fields, leaving out exclude and the derived
+    columns. Skipped columns are None, as their fields are not requested.
+    """
+    skipped = skipped_columns.get(table, ())
+    return {
+        column: None if column in skipped else element[field]
+        for column, field in table_fields[table].items()
+        if field is not None and column not in exclude
+    }
+
+
+def descriptionLength(board_id):
+    """
+    Returns the most characters of card description kept for a board: its
+    entry in board_description_lengths, otherwise description_length. None
+    keeps them whole and 0 does not request them.
+    """
+    if "card_description" in skipped_columns.get("card", ()):
+        return 0
+    return board_description_lengths.get(board_id, description_length)
+
+
+def cardDescriptions(cards, board_id):
+    """
+    Returns the descriptions of a board's cards cut to descriptionLength,
+    or None for each when they are not requested.
+    """
+    length = descriptionLength(board_id)
+    if length == 0:
+        return [None] * len(cards)
+    return [element["desc"][:length] for element in cards]
+
+
+"""
+Params of the board call made by fromBoardPull, placed after boardBase and
+the board id. Boards without descriptions use boardQuery(False).
+"""
+boardParams = boardQuery()
+
+
+class TokenBucket:
+    def __init__(self, rate, period):
+        """allows rate calls per period seconds, refilled continuously"""
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """blocks until a call may be made and takes a token for it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last) * self.fill_rate
+                )
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    def __init__(self, path, max_bytes):
+        """
+        provide the folder the responses are kept in and the most bytes of
+        responses to keep there; the least recently used are dropped first
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(path, "index.json")
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(self.index_path) as file:
+                self.index = json.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def key(self, base, params=None):
+        """returns the url of a call, without the key and token, as its key"""
+        if not params:
+            return base
+        separator = "&" if "?" in base else "?"
+        return base + separator + urllib.parse.urlencode(sorted(params.items()))
+
+    def body_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def read(self, key):
+        """returns the stored response for key, or None if it is gone"""
+        try:
+            with open(self.body_path(key)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def fresh(self, key, ttl):
+        """
+        returns the cached response for key if it was stored or revalidated
+        less than ttl seconds ago, otherwise None
+        """
+        with self.lock:
+            entry = self.index.get(key)
+            if ttl is None or entry is None or time.time() - entry["stored"] > ttl:
+                return None
+            entry["used"] = time.time()
+        body = self.read(key)
+        if body is not None:
+            with self.lock:
+                self.hits += 1
+        return body
+
+    def validators(self, key):
+        """returns the If-None-Match/If-Modified-Since headers for key"""
+        entry = self.index.get(key)
+        headers = {}
+        if entry is None or not os.path.exists(self.body_path(key)):
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def not_modified(self, key):
+        """
+        returns the cached response for key after a 304 from Trello, or None
+        if it was evicted since its validators were sent
+        """
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            entry["stored"] = entry["used"] = time.time()
+        body = self.read(key)
+        if body is not None:
+            with self.lock:
+                self.revalidated += 1
+        return body
+
+    def store(self, key, content, ttl, etag=None, last_modified=None):
+        """
+        keeps the response content, and counts a miss, if Trello sent an
+        ETag or Last-Modified for it or a ttl is given
+        """
+        if ttl is None and etag is None and last_modified is None:
+            return
+        with self.lock:
+            self.misses += 1
+        with open(self.body_path(key), "wb") as file:
+            file.write(content)
+        with self.lock:
+            self.index[key] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "stored": time.time(),
+                "used": time.time(),
+                "size": len(content),
+            }
+            self.evict()
+
+    def evict(self):
+        """drops the least recently used responses until under max_bytes"""
+        total = sum(entry["size"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda key: self.index[key]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)["size"]
+            try:
+                os.remove(self.body_path(key))
+            except OSError:
+                pass
+
+    def save(self):
+        """writes the index so the responses are found by the next run"""
+        with self.lock:
+            with open(self.index_path, "w") as file:
+                json.dump(self.index, file)
+
+    def merge(self, index, hits, revalidated, misses):
+        """
+        adds the index entries and counters of a cache used by a worker
+        process (see shardPull), keeping the most recently used entry of
+        each key
+        """
+        with self.lock:
+            for key, entry in index.items():
+                if key not in self.index or entry["used"] >= self.index[key]["used"]:
+                    self.index[key] = entry
+            self.hits += hits
+            self.revalidated += revalidated
+            self.misses += misses
+            self.evict()
+
+    def summary(self):
+        return "%d fresh, %d revalidated, %d missed" % (
+            self.hits,
+            self.revalidated,
+            self.misses,
+        )
+
+
+class Checkpoint:
+    def __init__(self, path):
+        """
+        provide the folder the board payloads and comment pages fetched by
+        a run are kept in until the run loads, or None to keep none, and
+        the boards whose comment file was started again this run
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.started = set()
+
+    def clear(self):
+        """drops every checkpoint, so the next pull fetches everything"""
+        self.started = set()
+        if self.path is not None and os.path.exists(self.path):
+            shutil.rmtree(self.path)
+
+    def file(self, kind, board_id):
+        folder = os.path.join(self.path, kind)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, board_id + ".json")
+
+    def load_board(self, board_id):
+        """returns the checkpointed payload of a board, or None"""
+        if self.path is None:
+            return None
+        try:
+            with open(self.file("boards", board_id)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def save_board(self, board_id, payload):
+        """
+        keeps a board payload, written aside and renamed so a failed run
+        never leaves half a payload behind
+        """
+        if self.path is None:
+            return
+        path = self.file("boards", board_id)
+        # json.dumps encodes in C, json.dump in Python chunks
+        with open(path + ".tmp", "w") as file:
+            file.write(json.dumps(payload))
+        os.replace(path + ".tmp", path)
+
+    def comment_pages(self, board_id, since):
+        """
+        returns the checkpointed comment pages of a board in the order they
+        were pulled, if they were pulled with the same since; otherwise none
+        """
+        if self.path is None:
+            return []
+        try:
+            with open(self.file("comments", board_id)) as file:
+                lines = file.read().splitlines()
+        except OSError:
+            return []
+        if not lines or json.loads(lines[0]) != {"since": since}:
+            return []
+        pages = []
+        for line in lines[1:]:
+            try:
+                pages.append(json.loads(line))
+            except ValueError:
+                # The last page was cut short by the failure
+                break
+        return pages
+
+    def add_comment_page(self, board_id, since, page):
+        """
+        appends a page of comments pulled for a board with since. The first
+        page added for a board this run writes the file again with only the
+        whole pages pulled with the same since, so a file never mixes
+        watermarks or follows a page cut short.
+        """
+        if self.path is None:
+            return
+        path = self.file("comments", board_id)
+        with self.lock:
+            if board_id not in self.started:
+                self.started.add(board_id)
+                pages = self.comment_pages(board_id, since)
+                with open(path, "w") as file:
+                    file.write(json.dumps({"since": since}) + "\n")
+                    for kept in pages:
+                        file.write(json.dumps(kept) + "\n")
+            with open(path, "a") as file:
+                file.write(json.dumps(page) + "\n")
 
 
 class TrelloCall:
     def __init__(self):
-        """provide the key and token, base, and counter"""
+        """
+        provide the key and token, a pooled session shared by every thread,
+        the rate limit bucket for the token, counters of the HTTP requests
+        made, the calls they carried (a batch request carries several) and
+        the body bytes read, and the response cache (unless config.py sets cache_dir to None).
+        The key and token go in the Authorization header rather than the
+        query string, so they never show up in a url an error reports.
+        """
         self.key = os.environ.get("TRELLO_KEY")
         self.token = os.environ.get("TRELLO_TOKEN")
         self.base = "https://trello.com/1/"
         self.counter = 0
-        self.k = []
-        self.jk = []
+        self.routes = 0
+        self.bytes = 0
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=board_workers, pool_maxsize=board_workers
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Authorization": 'OAuth oauth_consumer_key="%s", oauth_token="%s"'
+                % (self.key, self.token),
+            }
+        )
+        self.bucket = TokenBucket(rate_limit, rate_period)
+        self.lock = threading.Lock()
+        self.cache = None if cache_dir is None else ResponseCache(cache_dir, cache_size)
+
+    def backoff(self, attempt, response=None):
+        """
+        sleeps before a retry, honouring Retry-After when Trello sends it and
+        otherwise using exponential backoff with full jitter
+        """
+        if response is not None and "Retry-After" in response.headers:
+            try:
+                time.sleep(float(response.headers["Retry-After"]))
+                return
+            except ValueError:
+                pass
+        time.sleep(random.uniform(0, min(60, 2**attempt)))
+
+    def request(self, base, params=None, stream=False, headers=None, read=None):
+        """
+        makes one GET with the key and token and returns the response, or
+        what read returns for it when read is given. 429 and 5xx responses,
+        timeouts and connections dropped before or while the body is read
+        (by read too) are retried up to max_retries times.
+        """
+        for attempt in range(max_retries + 1):
+            self.bucket.acquire()
+            with self.lock:
+                self.counter += 1
+            try:
+                response = self.session.get(
+                    base,
+                    params=params,
+                    timeout=request_timeout,
+                    stream=stream,
+                    headers=headers,
+                )
+            except dropped_errors:
+                if attempt == max_retries:
+                    raise
+                self.backoff(attempt)
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == max_retries:
+                    response.raise_for_status()
+                self.backoff(attempt, response)
+                continue
+            if read is None:
+                return response
+            response.raise_for_status()
+            try:
+                return read(response)
+            except dropped_errors:
+                if attempt == max_retries:
+                    raise
+                self.backoff(attempt)
+
+    def read_stream(self, response):
+        """
+        returns the json of a streamed response, parsed as it is read off
+        the connection when ijson is installed
+        """
+        with response:
+            if ijson is None:
+                self.count_bytes(len(response.content))
+                return response.json()
+            response.raw.decode_content = True
+            body = next(ijson.items(response.raw, "", use_float=True))
+            self.count_bytes(response.raw.tell())
+            return body
+
+    def make_call(self, base, params=None, stream=False, ttl=None):
+        """
+        this is what will make the call and requires the url, extra query
+        params are optional. With stream (and ijson installed) the json is
+        parsed as it is read off the connection instead of being buffered
+        whole first; a body cut short is requested again.
+
+        Calls that are not streamed go through the response cache: a
+        response stored less than ttl seconds ago is returned without a
+        call, otherwise a cached ETag or Last-Modified is sent and a 304
+        returns the cached response.
+        """
+        cache_key = None
+        headers = None
+        if self.cache is not None and not stream:
+            cache_key = self.cache.key(base, params)
+            body = self.cache.fresh(cache_key, ttl)
+            if body is not None:
+                return body
+            headers = self.cache.validators(cache_key)
+        with self.lock:
+            self.routes += 1
+        if stream:
+            return self.request(base, params, stream, read=self.read_stream)
+        response = self.request(base, params, stream, headers)
+        if response.status_code == 304 and cache_key is not None:
+            body = self.cache.not_modified(cache_key)
+            if body is not None:
+                return body
+            response = self.request(base, params, stream)
+        response.raise_for_status()
+        self.count_bytes(len(response.content))
+        if cache_key is not None:
+            self.cache.store(
+                cache_key,
+                response.content,
+                ttl,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+        return response.json()
+
+    def route(self, base, params=None):
+        """
+        returns the url of a call relative to the API root, as the batch
+        endpoint expects, with its query values percent encoded so commas
+        in them are not read as route separators
+        """
+        route, _, query = base[len(apiBase) - 1 :].partition("?")
+        pairs = urllib.parse.parse_qsl(query) + list((params or {}).items())
+        if not pairs:
+            return route
+        return route + "?" + urllib.parse.urlencode(pairs, safe="")
+
+    def make_batch(self, calls, ttl=None):
+        """
+        makes many calls, given as (url, params) pairs, through Trello's
+        batch endpoint: up to batch_size routes per request, with the
+        requests made concurrently. Returns the json of each call in order.
+        Calls the response cache can answer are not sent, and a route the
+        batch reports as failed is made again on its own with make_call.
+        """
+        results = [None] * len(calls)
+        pending = []
+        for index, (base, params) in enumerate(calls):
+            if self.cache is not None:
+                body = self.cache.fresh(self.cache.key(base, params), ttl)
+                if body is not None:
+                    results[index] = body
+                    continue
+            pending.append(index)
+        chunks = [
+            pending[start : start + batch_size]
+            for start in range(0, len(pending), batch_size)
+        ]
+
+        def send(chunk):
+            if len(chunk) == 1:
+                index = chunk[0]
+                return [self.make_call(*calls[index], ttl=ttl)]
+            with self.lock:
+                self.routes += len(chunk)
+            routes = [self.route(*calls[index]) for index in chunk]
+            response = self.request(batchBase, {"urls": ",".join(routes)})
+            response.raise_for_status()
+            self.count_bytes(len(response.content))
+            bodies = []
+            for index, answer in zip(chunk, response.json()):
+                if "200" not in answer:
+                    bodies.append(self.make_call(*calls[index], ttl=ttl))
+                    continue
+                bodies.append(answer["200"])
+                if self.cache is not None:
+                    self.cache.store(
+                        self.cache.key(*calls[index]),
+                        json.dumps(answer["200"]).encode(),
+                        ttl,
+                    )
+            return bodies
+
+        with ThreadPoolExecutor(max_workers=board_workers) as executor:
+            for chunk, bodies in zip(chunks, executor.map(send, chunks)):
+                for index, body in zip(chunk, bodies):
+                    results[index] = body
+        return results
+
+    def count_bytes(self, size):
+        with self.lock:
+            self.bytes += size
+
+    def summary(self):
+        return "%d HTTP requests for %d calls" % (self.counter, self.routes)
+
+
+"""
+A single client is shared by every pull function so calls reuse pooled
+keep-alive connections and count against one rate limit.
+"""
+client = TrelloCall()
+
+"""
+Board payloads and comment pages are checkpointed to checkpoint_dir as they
+are fetched, so main.py --resume can pick up a failed pull where it stopped.
+"""
+checkpoint = Checkpoint(checkpoint_dir)
+
+
+def cardCreated(card_ids):
+    """
+    This calculates when each card in a column of card ids was created, from
+    the unix timestamp held in the first 8 hex digits of the id. The digits
+    are decoded for the whole column at once. Returns a datetime64 array.
+    """
+    digits = np.asarray(card_ids, dtype="S8").view(np.uint8).reshape(-1, 8)
+    digits = digits.astype(np.int64)
+    values = np.where(digits >= ord("a"), digits - ord("a") + 10, digits - ord("0"))
+    seconds = values @ (16 ** np.arange(7, -1, -1, dtype=np.int64))
+    return seconds.astype("datetime64[s]")
+
 
-    def make_call(self, base):
-        """this is what will make the call and requires the url"""
-        self.url_provided = base
-        params_key_and_token = {"key": self.key, "token": self.token}
-        response = requests.get(self.url_provided, params=params_key_and_token)
-        r = response.json()
-        return r
+def trelloDates(values):
+    """
+    Parses a column of the ISO 8601 UTC timestamps returned by Trello (e.g.
+    dateLastActivity) in one call. Returns a datetime64 array in UTC.
+    """
+    dates = pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601")
+    return dates.dt.tz_localize(None).to_numpy()
 
 
-def cardCreated(id):
+def trelloChecked(values):
     """
-    This gets used inline with the card function to calculate the date a
-    given card was created.
+    Converts a column of Trello checkbox values ("true" or "false", None on
+    rows without a checkbox) to a nullable boolean array.
     """
-    return pd.to_datetime(int(id[:8], 16), unit="s").date()
+    checked = pd.Series(values, dtype=object).map(
+        {"true": True, "false": False, True: True, False: False}
+    )
+    return checked.astype("boolean").array
 
 
+@metrics.timed
 def collectBoards(orgs):
     """
     This function accepts a list of dictionaries containing organization IDs as well as whether to run
     that particular org. In return, a list of dictionaries is provided containing board name, board id,
-    and whether that board is closed.
+    and whether that board is closed. The boards of every included org are
+    requested together through the batch endpoint.
     """
+    org_ids = [item["orgId"] for item in orgs if item["include"] != False]
+    org_boards = dict(
+        zip(
+            org_ids,
+            client.make_batch(
+                [
+                    (organizationBase + value + organizationParams, None)
+                    for value in org_ids
+                ]
+            ),
+        )
+    )
     board_list = []
     for item in orgs:
         if item["include"] == False:
             continue
         else:
-            call = TrelloCall()
-            r = call.make_call(organizationBase + item["orgId"] + organizationParams)
+            r = org_boards[item["orgId"]]
             for index, element in enumerate(r):
                 if element["id"] in excluded_boards:
                     board_list.append(
@@ -110,175 +854,251 @@ def collectBoards(orgs):
     return board_frame
 
 
+@metrics.timed
+def boardCall(board_id):
+    """
+    Makes the API call for a single board and returns the json payload,
+    parsed straight off the connection when ijson is installed. Boards
+    already checkpointed are returned without a call.
+    """
+    payload = checkpoint.load_board(board_id)
+    if payload is None:
+        params = boardParams if descriptionLength(board_id) != 0 else boardQuery(False)
+        payload = client.make_call(boardBase + board_id + params, stream=True)
+        checkpoint.save_board(board_id, payload)
+    else:
+        metrics.count("checkpoint_boards")
+    return payload
+
+
+def iterBoardPull(board_list):
+    """
+    Yields the payload of each board in board_list one at a time, in order.
+    Up to board_workers boards are fetched ahead in the background, so only
+    those payloads are held in memory at once.
+    """
+    board_ids = iter(board_list["board_id"])
+    with ThreadPoolExecutor(max_workers=board_workers) as executor:
+        pending = collections.deque(
+            executor.submit(boardCall, value)
+            for value in itertools.islice(board_ids, board_workers)
+        )
+        while pending:
+            payload = pending.popleft().result()
+            for value in itertools.islice(board_ids, 1):
+                pending.append(executor.submit(boardCall, value))
+            yield payload
+
+
+@metrics.timed
 def fromBoardPull(board_list):
     """
     This takes the outcome for the collectBoards function and returns a data
     payload for card, label, list, member, validfield, customfield, comments
-    will use this output for their own functions.
-    """
-    board_data = []
-    for item in board_list["board_id"]:
-        url = (
-            "https://api.trello.com/1/boards/"
-            + item
-            + "/?fields=name&checklists=all&members=all&member_fields=id,fullName,username,idBoard&labels=all&label_fields=id,name,idBoard,color&lists=all&list_fields=name,closed,idBoard&cards=all&card_fields=name,idBoard,idList,idLabels,idMembers,closed,dateLastActivity,idShort,shortLink,shortUrl,idChecklists,checkItemStates,desc&customFields=true&card_customFieldItems=true&key="
-            + query["key"]
-            + "&token="
-            + query["token"]
-        )
-        headers = {"Accept": "application/json"}
-        response = requests.request("GET", url, headers=headers)
-        response = response.json()
-        board_data.append(response)
-    return board_data
+    will use this output for their own functions. Boards are fetched
+    concurrently by up to board_workers threads (set in config.py) and the
+    payloads are returned in the same order as board_list.
+    """
+    return list(iterBoardPull(board_list))
 
 
-def cardDataPull(board_pull):
+def loadWatermarks(path=watermark_path):
     """
-    This returns a dataframe for all included board card data.
+    Returns the per board high-water marks saved by the last successful
+    incremental or full run, keyed by board id. Each board holds the newest
+    card dateLastActivity ("card") and newest comment action id ("comment").
+    An empty dictionary is returned when no run has been saved yet.
     """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def saveWatermarks(watermarks, path=watermark_path):
+    """
+    Persists the high-water marks once the data they describe is loaded.
+    """
+    with open(path, "w") as file:
+        json.dump(watermarks, file, indent=2, sort_keys=True)
+
+
+def cardAge(card_creation, today=None):
+    """
+    Returns the age of each card creation date as a Postgres interval literal
+    ("2 years 3 mons 4 days"), matching AGE(card_creation). Like Postgres,
+    a negative day difference borrows the days of the creation month.
+    """
+    today = pd.Timestamp(today or datetime.date.today())
+    creation = pd.to_datetime(pd.Series(card_creation))
+    months = (today.year - creation.dt.year) * 12 + today.month - creation.dt.month
+    days = today.day - creation.dt.day
+    borrow = days < 0
+    days = days.where(~borrow, days + creation.dt.days_in_month)
+    months = months - borrow.astype(int)
+    return (
+        (months // 12).astype(str)
+        + " years "
+        + (months % 12).astype(str)
+        + " mons "
+        + days.astype(str)
+        + " days"
+    )
+
+
+"""
+The per-table *DataPull walkers build the tables the way main.py did before
+BoardExtractor, each walking every payload again. main.py no longer calls
+them; benchmarks/extractBenchmark.py and readyBenchmark.py compare against
+them.
+"""
+
+
+@metrics.timed
+def cardDataPull(board_pull, label_frame, member_frame):
+    """
+    This returns a dataframe for all included board card data in the final
+    form of the card table. The label and member columns hold lists of names
+    resolved from the validLabelDataPull and validMemberDataPull frames, and
+    card_age holds the AGE() of card_creation.
+    """
+    label_names = dict(zip(label_frame["label_id"], label_frame["label_name"]))
+    member_names = dict(zip(member_frame["member_id"], member_frame["member_name"]))
     card_list = []
     for item in board_pull:
-        for element in item["cards"]:
-            card_list.append(
-                {
-                    "card_id": element["id"],
-                    "card_creation": cardCreated(element["id"]),
-                    "card_name": element["name"],
-                    "card_description": element["desc"],
-                    "board_id": element["idBoard"],
-                    "list_id": element["idList"],
-                    "card_last_active": element["dateLastActivity"],
-                    "label_id": element["idLabels"],
-                    "member_id": element["idMembers"],
-                    "card_number": element["idShort"],
-                    "card_link": element["shortLink"],
-                    "card_url": element["shortUrl"],
-                    "card_closed": element["closed"],
-                }
-            )
-    card_frame = pd.DataFrame(card_list)
-    return card_frame
+        descriptions = cardDescriptions(item["cards"], item["id"])
+        for element, description in zip(item["cards"], descriptions):
+            row = objectRow(element, "card", "card_description")
+            row["card_description"] = description
+            if row["label"] is not None:
+                row["label"] = [
+                    label_names[value] for value in row["label"] if value in label_names
+                ]
+            if row["member"] is not None:
+                row["member"] = [
+                    member_names[value]
+                    for value in row["member"]
+                    if value in member_names
+                ]
+            card_list.append(row)
+    card_frame = pd.DataFrame(card_list, columns=table_columns["card"])
+    card_frame["card_creation"] = cardCreated(card_frame["card_id"])
+    card_frame["card_last_active"] = trelloDates(card_frame["card_last_active"])
+    card_frame["card_age"] = cardAge(card_frame["card_creation"]).values
+    return compactFrame(card_frame, "card")
 
 
+@metrics.timed
 def checklistDataPull(board_pull):
+    """
+    Builds the checklist table in one pass over the checklists, carrying each
+    checklist's name, card and board down to its items. A checklist without
+    items still gets one row, with no item values.
+    """
     check_list = []
-    item_list = []
+    no_items = ({"state": None, "id": None, "name": None, "idMember": None},)
     for item in board_pull:
         for element in item["checklists"]:
-            check_list.append(
-                {
-                    "checklist_id": element["id"],
-                    "checklist_name": element["name"],
-                    "card_id": element["idCard"],
-                    "board_id": element["idBoard"],
-                }
-            )
-        for index in range(len(item["checklists"])):
-            for value in item["checklists"][index]["checkItems"]:
-                item_list.append(
-                    {
-                        "checklist_id": value["idChecklist"],
-                        "item_state": value["state"],
-                        "item_id": value["id"],
-                        "item_name": value["name"],
-                        "item_member": value["idMember"],
-                    }
+            for value in element["checkItems"] or no_items:
+                check_list.append(
+                    (
+                        element["id"],
+                        value["state"],
+                        value["id"],
+                        value["name"],
+                        value["idMember"],
+                        element["name"],
+                        element["idCard"],
+                        element["idBoard"],
+                    )
                 )
-    item_frame = pd.DataFrame(item_list)
-    check_frame = pd.DataFrame(check_list)
-    full_checklist = pd.merge(
-        item_frame,
-        check_frame,
-        how="right",
-        on="checklist_id",
-        left_index=False,
-        right_index=False,
+    full_checklist = pd.DataFrame(
+        check_list,
+        columns=[
+            "checklist_id",
+            "item_state",
+            "item_id",
+            "item_name",
+            "item_member",
+            "checklist_name",
+            "card_id",
+            "board_id",
+        ],
     )
-    return full_checklist
+    return compactFrame(full_checklist, "checklist")
 
 
-def validFieldOptionDataPull(validfield):
+@metrics.timed
+def fieldOptionCalls(field_ids):
     """
-    This takes in a list of custom fields, filters them for type = list and
-    makes API calls to grab the valid options and their ids. The ids can then
-    be joined to the table that stores the value ids at the card level.
+    Pulls the options of each list type custom field in field_ids, batched
+    together with client.make_batch. The options rarely change, so they are
+    cached for option_ttl seconds. Returns a list of options per field.
     """
-    option_list = []
-    filtered = validfield[validfield["field_type"] == "list"]
-    for value in filtered["field_id"]:
-        call = TrelloCall()
-        options = call.make_call(customFieldBase + value + "/options")
-        for item in options:
-            option_list.append(
-                {
-                    "field_option_id": item["_id"],
-                    "field_option_value": item["value"]["text"],
-                    "field_option_color": item["color"],
-                }
-            )
-    option_frame = pd.DataFrame(option_list)
-    return option_frame
+    return client.make_batch(
+        [(customFieldBase + value + "/options", None) for value in field_ids],
+        ttl=option_ttl,
+    )
+
+
+def fieldOptionRow(option):
+    """
+    Returns the validfieldoption row for an option, given either inline in a
+    board payload (keyed by id) or by the /options endpoint (keyed by _id).
+    """
+    return {
+        "field_option_id": option["_id"] if "_id" in option else option["id"],
+        "field_option_value": option["value"]["text"],
+        "field_option_color": option["color"],
+    }
 
 
+@metrics.timed
 def validListDataPull(board_pull):
     """
     Returns a dataframe for all list data for included boards.
     """
-    list_dict = []
-    for item in board_pull:
-        for element in item["lists"]:
-            list_dict.append(
-                {
-                    "list_id": element["id"],
-                    "list_name": element["name"],
-                    "board_id": element["idBoard"],
-                    "list_closed": element["closed"],
-                }
-            )
-    list_frame = pd.DataFrame(list_dict)
-    list_frame["list_closed"] = list_frame["list_closed"].astype("bool")
+    list_dict = [
+        objectRow(element, "validlist")
+        for item in board_pull
+        for element in item["lists"]
+    ]
+    list_frame = pd.DataFrame(list_dict, columns=table_columns["validlist"])
+    list_frame["list_closed"] = list_frame["list_closed"].astype("boolean")
     return list_frame
 
 
+@metrics.timed
 def validLabelDataPull(board_pull):
     """
     Returns a dataframe for label data for all included boards.
     """
-    label_dict = []
-    for item in board_pull:
-        for element in item["labels"]:
-            label_dict.append(
-                {
-                    "label_id": element["id"],
-                    "label_name": element["name"],
-                    "board_id": element["idBoard"],
-                    "label_color": element["color"],
-                }
-            )
-    label_frame = pd.DataFrame(label_dict)
+    label_dict = [
+        objectRow(element, "validlabel")
+        for item in board_pull
+        for element in item["labels"]
+    ]
+    label_frame = pd.DataFrame(label_dict, columns=table_columns["validlabel"])
     return label_frame
 
 
+@metrics.timed
 def validMemberDataPull(board_pull):
     """
     Returns a dataframe for all included board member data.
     """
-    full_list = []
-    for item in board_pull:
-        for element in item["members"]:
-            full_list.append(
-                {
-                    "member_id": element["id"],
-                    "member_name": element["fullName"],
-                    "member_username": element["username"],
-                }
-            )
-    member_frame = pd.DataFrame(full_list)
-    member_frame = pd.DataFrame(full_list).drop_duplicates(inplace=False)
+    full_list = [
+        objectRow(element, "validmember")
+        for item in board_pull
+        for element in item["members"]
+    ]
+    member_frame = pd.DataFrame(
+        full_list, columns=table_columns["validmember"]
+    ).drop_duplicates(inplace=False)
     return member_frame
 
 
+@metrics.timed
 def validFieldDataPull(board_pull):
     """
     Returns a dataframe for all validCustomField data for included boards.
@@ -294,45 +1114,63 @@ def validFieldDataPull(board_pull):
                     "field_type": element["type"],
                 }
             )
-        field_frame = pd.DataFrame(field_dict)
+    field_frame = pd.DataFrame(
+        field_dict, columns=["field_id", "field_name", "board_id", "field_type"]
+    )
     return field_frame
 
 
-def commentDataPull(board_pull):
+@metrics.timed
+def boardCommentCalls(board_ids, since):
     """
-    Returns dataframe for comments for comment included boards.
+    Pulls every commentCard action for each board in board_ids from the board
+    level actions endpoint, given since (an action id, or None) per board to
+    only pull newer actions. Trello returns the newest actions first, so each
+    following page asks for the actions before the oldest id seen until a
+    short page comes back. The pages of every board still being read are
+    requested together with client.make_batch. Returns a list of actions
+    per board.
+
+    Each page is checkpointed as it comes in, and pages checkpointed for a
+    board with the same since are reused, carrying on from the last one.
     """
-    comment_dict = []
-    for item in board_pull:
-        for element in item["cards"]:
-            url = (
-                "https://api.trello.com/1/cards/"
-                + element["id"]
-                + "/actions?filter=commentCard"
-                + "&key="
-                + query["key"]
-                + "&token="
-                + query["token"]
-            )
-            headers = {"Accept": "application/json"}
-            response = requests.request("GET", url, headers=headers)
-            r = response.json()
-            for item in r:
-                comment_dict.append(
-                    {
-                        "card_id": element["id"],
-                        "member_id": item["idMemberCreator"],
-                        "card_comment": item["data"]["text"],
-                        "comment_date": item["date"],
-                    }
-                )
-    comment_frame = pd.DataFrame(comment_dict)
-    comment_frame["comment_date"] = pd.to_datetime(
-        comment_frame["comment_date"]
-    ).dt.date
-    return comment_frame
+    params = []
+    for value in since:
+        board_params = {"filter": "commentCard", "limit": comment_page_limit}
+        if value is not None:
+            board_params["since"] = value
+        params.append(board_params)
+    actions = [[] for value in board_ids]
+    pending = []
+    for index, board_id in enumerate(board_ids):
+        pages = checkpoint.comment_pages(board_id, since[index])
+        metrics.count("checkpoint_comment_pages", len(pages))
+        for page in pages:
+            actions[index].extend(page)
+        if pages and len(pages[-1]) < comment_page_limit:
+            continue
+        if pages:
+            params[index]["before"] = pages[-1][-1]["id"]
+        pending.append(index)
+    while pending:
+        pages = client.make_batch(
+            [
+                (boardBase + board_ids[index] + "/actions", dict(params[index]))
+                for index in pending
+            ]
+        )
+        still_pending = []
+        for index, page in zip(pending, pages):
+            checkpoint.add_comment_page(board_ids[index], since[index], page)
+            actions[index].extend(page)
+            if len(page) == comment_page_limit:
+                params[index]["before"] = page[-1]["id"]
+                still_pending.append(index)
+        pending = still_pending
+    return actions
 
 
+@metrics.timed
 def fieldDataPull(board_pull):
     """
     Returns factual information for fields at the card level for included boards.
@@ -373,5 +1211,478 @@ def fieldDataPull(board_pull):
                             "field_checked": element["value"]["checked"],
                         }
                     )
-    cardField_frame = pd.DataFrame(field_dict)
-    return cardField_frame
+    cardField_frame = pd.DataFrame(field_dict, columns=table_columns["field"])
+    for column in skipped_columns.get("field", ()):
+        cardField_frame[column] = None
+    cardField_frame["field_date"] = trelloDates(cardField_frame["field_date"])
+    cardField_frame["field_checked"] = trelloChecked(cardField_frame["field_checked"])
+    return compactFrame(cardField_frame, "field")
+
+
+"""
+The dtypes of each table's columns that are not plain strings or the dates
+parsed by cardCreated and trelloDates. Trello ids repeated on many rows (the
+board and list of every card, the checklist and card of every item) and low
+cardinality values are categoricals, so each value is kept once per table
+with a small integer code per row.
+"""
+table_dtypes = {
+    "card": {
+        "board_id": "category",
+        "list_id": "category",
+        "card_number": "Int64",
+        "card_closed": "boolean",
+        "card_age": "category",
+    },
+    "checklist": {
+        "checklist_id": "category",
+        "item_state": "category",
+        "item_member": "category",
+        "checklist_name": "category",
+        "card_id": "category",
+        "board_id": "category",
+    },
+    "comment": {"card_id": "category", "member_id": "category"},
+    "field": {
+        "field_id": "category",
+        "card_id": "category",
+        "field_value_id": "category",
+        "field_checked": "boolean",
+    },
+    "validfield": {"board_id": "category", "field_type": "category"},
+    "validlabel": {"board_id": "category", "label_color": "category"},
+    "validlist": {"board_id": "category", "list_closed": "boolean"},
+    "validmember": {},
+    "validfieldoption": {"field_option_color": "category"},
+}
+
+"""
+The memory footprint in bytes of each table's frame before and after
+compactFrame last cast it, reported by memorySummary.
+"""
+frame_memory = {}
+
+
+def compactFrame(frame, table):
+    """
+    Returns the frame of a table with its columns cast to table_dtypes, and
+    keeps its footprint before and after in frame_memory.
+    """
+    before = frame.memory_usage(deep=True).sum()
+    frame = frame.astype(table_dtypes[table])
+    frame_memory[table] = (int(before), int(frame.memory_usage(deep=True).sum()))
+    return frame
+
+
+def memorySummary():
+    """
+    Returns the footprint of each table before and after compactFrame, in
+    MB, followed by the total.
+    """
+    before = sum(value[0] for value in frame_memory.values())
+    after = sum(value[1] for value in frame_memory.values())
+    return ", ".join(
+        [
+            "%s %.1f -> %.1f MB" % (table, value[0] / 1e6, value[1] / 1e6)
+            for table, value in frame_memory.items()
+        ]
+        + ["total %.1f -> %.1f MB" % (before / 1e6, after / 1e6)]
+    )
+
+
+class BoardExtractor:
+    def __init__(self, watermarks=None):
+        """
+        provide the board watermarks (see loadWatermarks) to only keep cards
+        and comments newer than them; every card and comment is kept without
+        """
+        self.watermarks = {} if watermarks is None else watermarks
+        self.columns = {
+            table: {column: [] for column in columns}
+            for table, columns in table_columns.items()
+        }
+        self.member_ids = set()
+        self.option_ids = set()
+        self.missing_options = []
+        self.card_ids = {}
+
+    def extend(self, table, rows, keys):
+        """
+        appends one column per entry of keys (column name to row key) to the
+        table, each built from the row dicts in a single comprehension.
+        Columns in skipped_columns are filled with None.
+        """
+        columns = self.columns[table]
+        skipped = skipped_columns.get(table, ())
+        for column, key in keys.items():
+            if column in skipped:
+                columns[column].extend([None] * len(rows))
+            else:
+                columns[column].extend([row[key] for row in rows])
+
+    def fields(self, table, *exclude):
+        """
+        returns the columns of a table read from the board payload, mapped
+        to their fields in table_fields, leaving out exclude
+        """
+        return {
+            column: field
+            for column, field in table_fields[table].items()
+            if field is not None and column not in exclude
+        }
+
+    @metrics.timed
+    def add_board(self, item):
+        """
+        walks one board payload once, appending its rows to every table but
+        comment. Rows are kept as one list per column rather than a dict per
+        row. The board's card watermark is moved to its newest card. List
+        type custom fields without their options in the payload are kept in
+        missing_options.
+        """
+        mark = self.watermarks.setdefault(item["id"], {})
+        since = mark.get("card")
+        self.extend("validlist", item["lists"], self.fields("validlist"))
+        self.extend("validlabel", item["labels"], self.fields("validlabel"))
+        label_names = dict(map(itemgetter("id", "name"), item["labels"]))
+        member_names = dict(map(itemgetter("id", "fullName"), item["members"]))
+        self.extend(
+            "validmember",
+            [
+                element
+                for element in item["members"]
+                if element["id"] not in self.member_ids
+            ],
+            self.fields("validmember"),
+        )
+        self.member_ids.update(member_names)
+        self.extend(
+            "validfield",
+            item["customFields"],
+            {
+                "field_id": "id",
+                "field_name": "name",
+                "board_id": "idModel",
+                "field_type": "type",
+            },
+        )
+        cards = [
+            element
+            for element in item["cards"]
+            if since is None or element["dateLastActivity"] > since
+        ]
+        self.extend(
+            "card", cards, self.fields("card", "card_description", "label", "member")
+        )
+        card = self.columns["card"]
+        card["card_description"].extend(cardDescriptions(cards, item["id"]))
+        skipped = skipped_columns.get("card", ())
+        card["label"].extend(
+            [
+                (
+                    None
+                    if "label" in skipped
+                    else [
+                        label_names[value]
+                        for value in element["idLabels"]
+                        if value in label_names
+                    ]
+                )
+                for element in cards
+            ]
+        )
+        card["member"].extend(
+            [
+                (
+                    None
+                    if "member" in skipped
+                    else [
+                        member_names[value]
+                        for value in element["idMembers"]
+                        if value in member_names
+                    ]
+                )
+                for element in cards
+            ]
+        )
+        # Each custom field item fills one of the value columns, tried in
+        # the order idValue, date, text, checked.
+        values = [
+            value
+            for element in cards
+            for value in element["customFieldItems"]
+            if "idValue" in value
+            or "date" in value["value"]
+            or "text" in value["value"]
+            or "checked" in value["value"]
+        ]
+        self.extend(
+            "field", values, {"field_id": "idCustomField", "card_id": "idModel"}
+        )
+        field = self.columns["field"]
+        field["field_value_id"].extend([value.get("idValue") for value in values])
+        field["field_date"].extend(
+            [
+                None if "idValue" in value else value["value"].get("date")
+                for value in values
+            ]
+        )
+        field["field_text"].extend(
+            [
+                (
+                    None
+                    if "idValue" in value or "date" in value["value"]
+                    else value["value"].get("text")
+                )
+                for value in values
+            ]
+        )
+        field["field_checked"].extend(
+            [
+                (
+                    None
+                    if "idValue" in value
+                    or "date" in value["value"]
+                    or "text" in value["value"]
+                    else value["value"].get("checked")
+                )
+                for value in values
+            ]
+        )
+        # A checklist without items still gets one row, with no item values.
+        card_ids = set(map(itemgetter("id"), cards))
+        checklists = [
+            element for element in item["checklists"] if element["idCard"] in card_ids
+        ]
+        no_items = ({"state": None, "id": None, "name": None, "idMember": None},)
+        self.extend(
+            "checklist",
+            [
+                element
+                for element in checklists
+                for value in element["checkItems"] or no_items
+            ],
+            self.fields("checklist"),
+        )
+        self.extend(
+            "checklist",
+            [
+                value
+                for element in checklists
+                for value in element["checkItems"] or no_items
+            ],
+            {
+                "item_state": "state",
+                "item_id": "id",
+                "item_name": "name",
+                "item_member": "idMember",
+            },
+        )
+        for element in item["customFields"]:
+            if element["type"] != "list":
+                continue
+            if "options" in element:
+                self.add_options(element["options"])
+            else:
+                self.missing_options.append(element["id"])
+        if cards:
+            mark["card"] = max(map(itemgetter("dateLastActivity"), cards))
+        self.card_ids[item["id"]] = set(map(itemgetter("id"), item["cards"]))
+
+    def add_options(self, options):
+        """
+        appends the options of a list type custom field, from its board
+        payload or fieldOptionCalls, skipping any already added
+        """
+        option = self.columns["validfieldoption"]
+        for item in options:
+            row = fieldOptionRow(item)
+            if row["field_option_id"] in self.option_ids:
+                continue
+            self.option_ids.add(row["field_option_id"])
+            for column, value in row.items():
+                option[column].append(value)
+
+    @metrics.timed
+    def add_comments(self, board_id, actions):
+        """
+        appends the commentCard actions from boardCommentCalls for a board
+        already given to add_board, keeping only comments on its cards, and
+        moves the board's comment watermark to the newest one
+        """
+        if actions:
+            # Actions come back newest first.
+            self.watermarks.setdefault(board_id, {})["comment"] = actions[0]["id"]
+        card_ids = self.card_ids[board_id]
+        comment = self.columns["comment"]
+        for action in actions:
+            card_id = action["data"]["card"]["id"]
+            if card_id in card_ids:
+                comment["card_id"].append(card_id)
+                comment["member_id"].append(action["idMemberCreator"])
+                comment["card_comment"].append(action["data"]["text"])
+                comment["comment_date"].append(action["date"])
+                comment["comment_id"].append(action["id"])
+
+    @metrics.timed
+    def frames(self):
+        """
+        returns a dictionary of dataframes keyed by table name, cast with
+        compactFrame. Each table's column lists are dropped once its frame
+        is built, so frames can only be called once.
+        """
+        # Columns filled without extend, such as the custom field values,
+        # are emptied here when skipped, before the dates are parsed.
+        for table, skipped in skipped_columns.items():
+            columns = self.columns[table]
+            for column in skipped:
+                columns[column] = [None] * len(columns[column])
+        card = self.columns["card"]
+        card["card_creation"] = cardCreated(card["card_id"])
+        card["card_last_active"] = trelloDates(card["card_last_active"])
+        card["card_age"] = cardAge(card["card_creation"]).tolist()
+        comment = self.columns["comment"]
+        comment["comment_date"] = trelloDates(comment["comment_date"])
+        field = self.columns["field"]
+        field["field_date"] = trelloDates(field["field_date"])
+        field["field_checked"] = trelloChecked(field["field_checked"])
+        board_data = {}
+        for table in table_columns:
+            frame = pd.DataFrame(self.columns.pop(table), columns=table_columns[table])
+            board_data[table] = compactFrame(frame, table)
+        return board_data
+
+
+def extractBoards(board_list, watermarks):
+    """
+    Pulls the boards in board_list one at a time with iterBoardPull and walks
+    each payload once with a BoardExtractor before the next board is taken,
+    then adds the comments of comment included boards, pulled with
+    boardCommentCalls and batched together. Returns the extractor.
+    """
+    comment_ids = set(board_list[board_list["board_comment"] == True]["board_id"])
+    extractor = BoardExtractor(watermarks)
+    comment_boards = []
+    for item in iterBoardPull(board_list):
+        extractor.add_board(item)
+        if item["id"] in comment_ids:
+            comment_boards.append(item["id"])
+    since = [watermarks.get(value, {}).get("comment") for value in comment_boards]
+    board_actions = boardCommentCalls(comment_boards, since)
+    for board_id, actions in zip(comment_boards, board_actions):
+        extractor.add_comments(board_id, actions)
+    return extractor
+
+
+@metrics.timed
+def streamDataPull(board_list, watermarks):
+    """
+    Extracts the boards in board_list with extractBoards, so peak memory is
+    bounded by the largest board rather than the whole organization. Only
+    cards and comments newer than watermarks are kept. Custom field options
+    come from the board payloads, with fieldOptionCalls pulling only those
+    missing from them. Returns a dictionary of dataframes keyed by table name.
+    """
+    extractor = extractBoards(board_list, watermarks)
+    for options in fieldOptionCalls(extractor.missing_options):
+        extractor.add_options(options)
+    return extractor.frames()
+
+
+def shardPull(board_list, watermarks, shard_count):
+    """
+    Runs in a worker process of shardedDataPull. The boards of one shard are
+    extracted with their own client, allowed 1/shard_count of the rate
+    limit, and the frames are returned with the list fields missing their
+    options, the shard's watermarks, and the metrics and client counters
+    for the parent process to merge.
+    """
+    global client
+    client = TrelloCall()
+    client.bucket = TokenBucket(rate_limit / shard_count, rate_period)
+    metrics.stages.clear()
+    metrics.counters.clear()
+    extractor = extractBoards(board_list, watermarks)
+    board_ids = set(board_list["board_id"])
+    cache = client.cache
+    return {
+        "frames": extractor.frames(),
+        "missing_options": extractor.missing_options,
+        "watermarks": {
+            key: value for key, value in watermarks.items() if key in board_ids
+        },
+        "stages": metrics.stages,
+        "counters": metrics.counters,
+        "client": (client.counter, client.routes, client.bytes),
+        "cache": (
+            None
+            if cache is None
+            else (cache.index, cache.hits, cache.revalidated, cache.misses)
+        ),
+    }
+
+
+@metrics.timed
+def shardedDataPull(board_list, watermarks, shard_count=shards):
+    """
+    Splits board_list into up to shard_count runs of consecutive boards and
+    pulls and extracts each in its own process with shardPull, so parsing
+    large boards uses more than one core. The shards' frames are joined in
+    board order and the members and options shared between shards are kept
+    once, so the tables match streamDataPull's. Options missing from the
+    board payloads are pulled here once the shards are done. Worker
+    processes are forked, so where fork is not available (Windows) the
+    boards are pulled with streamDataPull instead.
+    """
+    size = -(-len(board_list) // max(shard_count, 1))
+    parts = [
+        board_list.iloc[start : start + size]
+        for start in range(0, len(board_list), max(size, 1))
+    ]
+    if len(parts) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return streamDataPull(board_list, watermarks)
+    with ProcessPoolExecutor(
+        max_workers=len(parts), mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        results = list(
+            executor.map(
+                shardPull,
+                parts,
+                [watermarks] * len(parts),
+                [len(parts)] * len(parts),
+            )
+        )
+    board_data = {}
+    for table in table_columns:
+        frames = [result["frames"][table] for result in results]
+        # Categoricals with different categories are joined as strings and
+        # cast again below.
+        board_data[table] = pd.concat(
+            [value for value in frames if len(value)] or frames[:1],
+            ignore_index=True,
+        )
+    board_data["validmember"] = board_data["validmember"].drop_duplicates(
+        "member_id", ignore_index=True
+    )
+    missing = [value for result in results for value in result["missing_options"]]
+    option_frames = [board_data["validfieldoption"]] + [
+        pd.DataFrame(
+            [fieldOptionRow(item) for item in options],
+            columns=table_columns["validfieldoption"],
+        )
+        for options in fieldOptionCalls(missing)
+    ]
+    board_data["validfieldoption"] = pd.concat(
+        [value for value in option_frames if len(value)] or option_frames[:1],
+        ignore_index=True,
+    ).drop_duplicates("field_option_id", ignore_index=True)
+    for result in results:
+        watermarks.update(result["watermarks"])
+        metrics.merge(result["stages"], result["counters"])
+        counter, routes, read = result["client"]
+        client.counter += counter
+        client.routes += routes
+        client.bytes += read
+        if client.cache is not None and result["cache"] is not None:
+            client.cache.merge(*result["cache"])
+    return {table: compactFrame(frame, table) for table, frame in board_data.items()}
@@ -1,26 +1,21 @@
-UPDATE card 
-SET label_id = REPLACE(REPLACE(REPLACE(REPLACE(label_id, '[', '{'),']','}'),' ',''),'''','');
+SET LOCAL search_path TO trello_shadow, public;
 
-UPDATE card 
-SET member_id = REPLACE(REPLACE(REPLACE(REPLACE(member_id, '[', '{'),']','}'),' ',''),'''','');
+ANALYZE validboard;
 
-UPDATE card
-SET label_id = f_get_label(label_id);
+ANALYZE card;
 
-UPDATE card
-SET member_id = f_get_member(member_id);
+ANALYZE comment;
 
-ALTER TABLE public.card RENAME COLUMN label_id TO label;
+ANALYZE checklist;
 
-ALTER TABLE public.card RENAME COLUMN member_id TO member;
+ANALYZE field;
 
-ALTER TABLE public.card ADD COLUMN card_age INTERVAL NULL;
+ANALYZE validfieldoption;
 
-UPDATE card
-SET card_age = AGE(card_creation);
+ANALYZE validfield;
 
-CALL p_create_views('timetrade');
+ANALYZE validlabel;
 
-CALL p_create_views('teambazing');
+ANALYZE validlist;
 
-CALL p_create_views('dsdgisintern');
\ No newline at end of file
+ANALYZE validmember;
\ No newline at end of file
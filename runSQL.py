@@ -35,3 +35,4 @@ def runScriptSQL(sql):
 
 
 runScriptSQL("readyDatabase.sql")
+runScriptSQL("swapDatabase.sql")
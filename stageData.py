@@ -1,11 +1,27 @@
-import dropbox as db
 import psycopg2
 from psycopg2 import extras
+from psycopg2 import pool as pg_pool
 import pandas as pd
 import io
 import numpy as np
 import datetime
 import os
+import config
+import metrics
+import stageStore
+import contextlib
+import logging
+import logging.handlers
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 
 """
 Setting up dropbox credential.
@@ -23,24 +39,183 @@ postgres_config = {
 }
 
 """
-Creates the connection with dropbox API.
+Tables are loaded with COPY unless config.py sets load_method to "insert",
+which uses execute_values instead.
+"""
+load_method = getattr(config, "load_method", "copy")
+
+"""
+With direct_load the dataframes are copied into Postgres from memory while
+their staging snapshots upload in the background. Without it the snapshots
+are uploaded first and then read back from the staging environment.
+"""
+direct_load = getattr(config, "direct_load", True)
+
+"""
+Staging snapshots are written as zstd compressed Parquet files with the
+schemas in snapshot_schemas, or as CSV files when config.py sets
+snapshot_format to "csv" (the default when pyarrow is not installed).
+snapshot_extension is the file extension main.py gives the snapshots.
 """
-dbx = db.Dropbox(os.environ.get("DROPBOX_ACCESS"))
+snapshot_format = getattr(config, "snapshot_format", "csv" if pa is None else "parquet")
+snapshot_compression = getattr(config, "snapshot_compression", "zstd")
+snapshot_extension = ".parquet" if snapshot_format == "parquet" else ".csv"
 
 """
-Creates the connection with Postgres database.
+Creates the staging environment, Dropbox unless config.py sets stage_backend
+to "local" to keep the files under stage_dir.
 """
-conn = psycopg2.connect(
-    "host="
-    + postgres_config["host"]
-    + " dbname="
-    + postgres_config["dbname"]
-    + " user="
-    + postgres_config["user"]
-    + " password="
-    + postgres_config["password"]
+store = stageStore.makeStore(
+    getattr(config, "stage_backend", "dropbox"),
+    access_token=dropbox_config["access_token"],
+    root=getattr(config, "stage_dir", "staging"),
 )
 
+"""
+Snapshot uploads running in the background, and the CSV bytes of each staged
+file kept for direct_load, both keyed by the file path, and the paths this
+run failed to stage. The staging environment still holds the previous run's
+file at such a path, so it must not be loaded.
+"""
+upload_pool = ThreadPoolExecutor(max_workers=2)
+uploads = {}
+staged = {}
+unstaged = set()
+
+"""
+Postgres connections come from a pool of up to pool_size connections that is
+only created on first use, so importing this script needs no database.
+"""
+pool_size = getattr(config, "pool_size", 4)
+conn_pool = None
+conn_pool_lock = threading.Lock()
+
+"""
+The run log is kept at log_path in the staging environment. Lines are held
+in memory and added to it in one write when the run ends (or the process
+exits), and once it passes log_max_bytes it is rotated to log_backups
+numbered copies. Unless local_log_path is None the lines are also written
+straight to that local file as they are logged.
+"""
+log_path = "/ETL_log/trello_log.txt"
+log_max_bytes = getattr(config, "log_max_bytes", 1024 * 1024)
+log_backups = getattr(config, "log_backups", 5)
+local_log_path = getattr(config, "local_log_path", "trello_log.txt")
+
+
+class LogFormatter(logging.Formatter):
+    def __init__(self):
+        """formats lines as "date time -> message" like the log always has"""
+        super().__init__("%(asctime)s -> %(message)s", "%m/%d/%Y %I:%M %p")
+
+    def format(self, record):
+        """the separator record that ends a run is a line of asterisks"""
+        if getattr(record, "separator", False):
+            return "*" * 92
+        return super().format(record)
+
+
+class StoreLogHandler(logging.Handler):
+    def __init__(self, store, path, max_bytes, backups):
+        """
+        provide the staging store, the log file path in it, the size past
+        which the file is rotated and the number of rotated copies kept
+        """
+        super().__init__()
+        self.store = store
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer = []
+
+    def emit(self, record):
+        self.buffer.append("\r\n" + self.format(record))
+
+    def backup_path(self, index):
+        root, extension = os.path.splitext(self.path)
+        return "%s.%d%s" % (root, index, extension)
+
+    def flush(self):
+        """
+        adds the buffered lines to the log file with one read and one write,
+        first moving the file to the numbered copies if it would grow past
+        max_bytes. A log that does not exist yet is started empty.
+        """
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+            lines = "".join(self.buffer).encode()
+            existing = b""
+            if self.store.exists(self.path):
+                existing = self.store.read(self.path)
+            if existing and len(existing) + len(lines) > self.max_bytes:
+                for index in range(self.backups - 1, 0, -1):
+                    try:
+                        older = self.store.read(self.backup_path(index))
+                    except Exception:
+                        continue
+                    self.store.write(self.backup_path(index + 1), older)
+                if self.backups:
+                    self.store.write(self.backup_path(1), existing)
+                existing = b""
+            self.store.write(self.path, existing + lines)
+            self.buffer = []
+        finally:
+            self.release()
+
+
+"""
+The run logger. Its handlers are flushed by flush_log, and by logging itself
+when the process exits, so lines logged before a crash are not lost.
+"""
+log_handler = StoreLogHandler(store, log_path, log_max_bytes, log_backups)
+log_handler.setFormatter(LogFormatter())
+logger = logging.getLogger("trello_etl")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(log_handler)
+if local_log_path is not None:
+    local_handler = logging.handlers.RotatingFileHandler(
+        local_log_path, maxBytes=log_max_bytes, backupCount=log_backups
+    )
+    local_handler.setFormatter(LogFormatter())
+    logger.addHandler(local_handler)
+
+
+def get_pool():
+    """
+    Returns the Postgres connection pool, creating it on first use.
+    """
+    global conn_pool
+    with conn_pool_lock:
+        if conn_pool is None:
+            conn_pool = pg_pool.ThreadedConnectionPool(
+                1,
+                pool_size,
+                "host="
+                + postgres_config["host"]
+                + " dbname="
+                + postgres_config["dbname"]
+                + " user="
+                + postgres_config["user"]
+                + " password="
+                + postgres_config["password"],
+            )
+    return conn_pool
+
+
+@contextlib.contextmanager
+def connection():
+    """
+    Borrows a connection from the pool for the length of the with block.
+    """
+    conn = get_pool().getconn()
+    try:
+        yield conn
+    finally:
+        get_pool().putconn(conn)
+
 
 def update_log(type, message=""):
     """
@@ -48,54 +223,227 @@ def update_log(type, message=""):
     error processing one of the arms of the etl. It will log the function,
     the table (if applicable), the file (if applicable), and the date and
     time the error occurred. It will also log the start and stop time of the
-    etl.
-    """
-    today = datetime.datetime.now().strftime("%m/%d/%Y %I:%M %p")
-    _, res = dbx.files_download("/ETL_log/trello_log.txt")
-    res.raise_for_status()
-    with io.BytesIO(res.content) as stream:
-        txt = stream.read().decode()
-        if type == "start":
-            text = "\r\n" + str(today) + " -> " + message
-        elif type == "end" and message != "":
-            text = (
-                "\r\n"
-                + str(today)
-                + " -> "
-                + message
-                + (
-                    "\r\n"
-                    + "********************************************************************************************"
-                )
-            )
-        elif type == "end" and message == "":
-            text = (
-                "\r\n"
-                + "********************************************************************************************"
-            )
-    new_message = txt + text
-    with io.BytesIO(new_message.encode()) as stream:
-        stream.seek(0)
-        dbx.files_upload(
-            stream.read(), "/ETL_log/trello_log.txt", mode=db.files.WriteMode.overwrite
-        )
+    etl. The "end" type closes the run with a line of asterisks and sends
+    the run's lines to the staging environment with flush_log.
+    """
+    if message != "":
+        if message.upper().startswith("ERROR"):
+            logger.error(message)
+        else:
+            logger.info(message)
+    if type == "end":
+        logger.info("", extra={"separator": True})
+        flush_log()
     return
 
 
+def flush_log():
+    """
+    Writes the buffered log lines to the staging environment (and flushes
+    the local log file).
+    """
+    for handler in logger.handlers:
+        handler.flush()
+
+
+def snapshot_schemas():
+    """
+    Returns the Arrow schema of the snapshot of each table, keyed by table
+    name, matching the columns and types of the dataframes from pullData.
+    """
+    text = pa.string()
+    flag = pa.bool_()
+    timestamp = pa.timestamp("us")
+    names = pa.list_(pa.string())
+    return {
+        "validboard": pa.schema(
+            [
+                ("board_name", text),
+                ("board_id", text),
+                ("board_closed", flag),
+                ("board_included", flag),
+                ("board_comment", flag),
+                ("schema_name", text),
+            ]
+        ),
+        "card": pa.schema(
+            [
+                ("card_id", text),
+                ("card_creation", timestamp),
+                ("card_name", text),
+                ("card_description", text),
+                ("board_id", text),
+                ("list_id", text),
+                ("card_last_active", timestamp),
+                ("label", names),
+                ("member", names),
+                ("card_number", pa.int64()),
+                ("card_link", text),
+                ("card_url", text),
+                ("card_closed", flag),
+                ("card_age", text),
+            ]
+        ),
+        "checklist": pa.schema(
+            [
+                ("checklist_id", text),
+                ("item_state", text),
+                ("item_id", text),
+                ("item_name", text),
+                ("item_member", text),
+                ("checklist_name", text),
+                ("card_id", text),
+                ("board_id", text),
+            ]
+        ),
+        "comment": pa.schema(
+            [
+                ("card_id", text),
+                ("member_id", text),
+                ("card_comment", text),
+                ("comment_date", timestamp),
+                ("comment_id", text),
+            ]
+        ),
+        "field": pa.schema(
+            [
+                ("field_id", text),
+                ("card_id", text),
+                ("field_text", text),
+                ("field_value_id", text),
+                ("field_date", timestamp),
+                ("field_checked", flag),
+            ]
+        ),
+        "validfield": pa.schema(
+            [
+                ("field_id", text),
+                ("field_name", text),
+                ("board_id", text),
+                ("field_type", text),
+            ]
+        ),
+        "validfieldoption": pa.schema(
+            [
+                ("field_option_id", text),
+                ("field_option_value", text),
+                ("field_option_color", text),
+            ]
+        ),
+        "validlabel": pa.schema(
+            [
+                ("label_id", text),
+                ("label_name", text),
+                ("board_id", text),
+                ("label_color", text),
+            ]
+        ),
+        "validlist": pa.schema(
+            [
+                ("list_id", text),
+                ("list_name", text),
+                ("board_id", text),
+                ("list_closed", flag),
+            ]
+        ),
+        "validmember": pa.schema(
+            [
+                ("member_id", text),
+                ("member_name", text),
+                ("member_username", text),
+            ]
+        ),
+    }
+
+
+def snapshot_bytes(df, table):
+    """
+    Returns the staging snapshot of the dataframe for the table (e.g.
+    trello_shadow.card or card_delta) in snapshot_format.
+    """
+    if snapshot_format != "parquet":
+        return bytes(csv_ready(df).to_csv(index=False), "utf8")
+    name = table.split(".")[-1]
+    if name.endswith("_delta"):
+        name = name[: -len("_delta")]
+    schema = snapshot_schemas()[name]
+    if len(df):
+        arrow_table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    else:
+        # Empty frames come out of pandas as float columns
+        arrow_table = schema.empty_table()
+    with io.BytesIO() as stream:
+        pq.write_table(arrow_table, stream, compression=snapshot_compression)
+        return stream.getvalue()
+
+
+def read_snapshot(file_name, columns=None):
+    """
+    Reads a Parquet snapshot from the staging environment into a dataframe
+    with the types it was written with. Provide columns to read only those.
+    """
+    with io.BytesIO(store.read(file_name)) as stream:
+        return pq.read_table(stream, columns=columns).to_pandas()
+
+
+def to_pg_array(values):
+    """
+    Formats a list as a Postgres array literal with every element quoted, so
+    list columns such as card label and member load into TEXT[] columns.
+    """
+    elements = [
+        '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for value in values
+    ]
+    return "{" + ",".join(elements) + "}"
+
+
+def csv_ready(df):
+    """
+    Returns the dataframe with any list columns formatted by to_pg_array so
+    it can be written to CSV for COPY or execute_values.
+    """
+    list_columns = [
+        column
+        for column in df.columns
+        if df[column].dtype == object
+        and len(df)
+        and isinstance(df[column].iloc[0], (list, np.ndarray))
+    ]
+    if list_columns:
+        df = df.assign(
+            **{column: df[column].map(to_pg_array) for column in list_columns}
+        )
+    return df
+
+
+@metrics.timed
 def trello_to_db(data_payload):
     """
     This takes in the dictionary of tables (keys), path, and trello function and
-    uploads it to Dropbox as a CSV file. File name comes from the path and the
-    dataframe object is supplied by the function in the dictionary.
+    uploads it to the staging environment as a snapshot_bytes file. File name
+    comes from the path and the dataframe object is supplied by the function
+    in the dictionary. With direct_load the uploads run in the background and
+    the table is kept as CSV bytes for load_data_db; call finish_uploads once
+    loaded. The paths that fail are kept in unstaged.
     """
+    unstaged.clear()
     for key, value in data_payload.items():
         try:
             df = value[1]
             path = value[0]
-            df_string = df.to_csv(index=False)
-            db_bytes = bytes(df_string, "utf8")
-            dbx.files_upload(f=db_bytes, path=path, mode=db.files.WriteMode.overwrite)
+            db_bytes = snapshot_bytes(df, key)
+            metrics.count("staged_bytes", len(db_bytes))
+            if direct_load:
+                if snapshot_format == "parquet":
+                    staged[path] = bytes(csv_ready(df).to_csv(index=False), "utf8")
+                else:
+                    staged[path] = db_bytes
+                uploads[path] = upload_pool.submit(store.write, path, db_bytes)
+            else:
+                store.write(path, db_bytes)
         except:
+            unstaged.add(value[0])
             error_message = (
                 "ERROR: " + "Trello data pull for file " + value[0] + " failed."
             )
@@ -103,16 +451,46 @@ def trello_to_db(data_payload):
     return
 
 
+@metrics.timed
+def finish_uploads():
+    """
+    Waits for the background snapshot uploads started by trello_to_db and
+    logs any that failed. The kept CSV bytes are released.
+    """
+    for path, upload in uploads.items():
+        try:
+            upload.result()
+        except Exception as err:
+            error_message = (
+                "ERROR: " + "Snapshot upload for file " + path + " failed." + str(err)
+            )
+            update_log("start", error_message)
+    uploads.clear()
+    staged.clear()
+    return
+
+
+@metrics.timed
 def readyDropboxFile(file_name):
     """
-    This function uses the dropbox sdk to retrieve a CSV file and ready it for
-    database ingestion. Required is the dbx instance and the file name to be
+    This function retrieves a staged file from the staging environment and
+    readies it for database ingestion. Required is the file name to be
     prepped for ingestion. File name should include '/' as prefix to actual
-    name.
+    name. Parquet snapshots keep their types, so only their missing values
+    and list columns need readying.
     """
     try:
-        _, response = dbx.files_download(file_name)
-        with io.BytesIO(response.content) as stream:
+        if file_name.endswith(".parquet") and file_name not in staged:
+            df = read_snapshot(file_name).astype(object)
+            for column in df.columns:
+                if len(df) and isinstance(df[column].iloc[0], np.ndarray):
+                    df[column] = df[column].map(list)
+            return df.where(df.notna(), None)
+        if file_name in staged:
+            data = staged[file_name]
+        else:
+            data = store.read(file_name)
+        with io.BytesIO(data) as stream:
             df = pd.read_csv(stream)
             df = df.fillna(np.nan)
             df = df.replace({np.nan: None})
@@ -133,34 +511,116 @@ def db_to_postgres(df, table):
     cols = ",".join(list(df.columns))
     # SQL quert to execute
     query = "INSERT INTO %s(%s) VALUES %%s" % (table, cols)
-    cursor = conn.cursor()
-    try:
-        extras.execute_values(cursor, query, tuples)
-        conn.commit()
-    except (Exception, psycopg2.DatabaseError) as error:
-        update_log("start", "Error: %s" % error)
-        conn.rollback()
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with metrics.stage("insert " + table) as record:
+                extras.execute_values(cursor, query, tuples)
+                conn.commit()
+                record["rows"] = len(tuples)
+        except (Exception, psycopg2.DatabaseError) as error:
+            update_log("start", "Error: %s" % error)
+            conn.rollback()
+            cursor.close()
+            return 1
+        cursor.close()
+
+
+def copy_to_postgres(stream, table):
+    """
+    This streams a CSV file (with a header row) straight into the respective
+    table with COPY, so no Python objects are built for the rows. The stream
+    only needs a read method, e.g. the raw Dropbox download.
+    """
+    # Column names come from the CSV header
+    cols = stream.readline().decode().strip()
+    # SQL query to execute
+    query = "COPY %s(%s) FROM STDIN WITH CSV" % (table, cols)
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with metrics.stage("copy " + table) as record:
+                cursor.copy_expert(query, stream)
+                conn.commit()
+                record["rows"] = cursor.rowcount
+        except (Exception, psycopg2.DatabaseError) as error:
+            update_log("start", "Error: %s" % error)
+            conn.rollback()
+            cursor.close()
+            return 1
         cursor.close()
-        return 1
-    cursor.close()
 
 
+def copyDropboxFile(file_name, table):
+    """
+    This streams a staged CSV file into the table with copy_to_postgres
+    without reading it into a dataframe. Files kept by trello_to_db for
+    direct_load are copied from memory instead of the staging environment.
+    Parquet snapshots are read into a dataframe and copied as CSV.
+    """
+    if file_name in staged:
+        with io.BytesIO(staged[file_name]) as stream:
+            return copy_to_postgres(stream, table)
+    if file_name.endswith(".parquet"):
+        df = csv_ready(read_snapshot(file_name))
+        with io.BytesIO(bytes(df.to_csv(index=False), "utf8")) as stream:
+            return copy_to_postgres(stream, table)
+    with store.open(file_name) as stream:
+        return copy_to_postgres(stream, table)
+
+
+def load_table(table, file_name):
+    """
+    Loads one staged file into its table on a pooled connection, committing
+    or rolling back that table on its own. Returns the table, whether it
+    loaded, and the seconds it took. A file this run did not stage (in
+    unstaged, or missing from staged with direct_load) fails its table
+    rather than loading the previous run's file from the staging environment.
+    """
+    start = time.perf_counter()
+    try:
+        if file_name in unstaged or (direct_load and file_name not in staged):
+            raise ValueError("File " + file_name + " was not staged by this run.")
+        if load_method == "copy":
+            result = copyDropboxFile(file_name, table)
+        else:
+            fl = readyDropboxFile(file_name)
+            result = db_to_postgres(fl, table)
+        loaded = result != 1
+    except:
+        loaded = False
+        error_message = (
+            "ERROR: File " + file_name + " failed to load into table " + table + "."
+        )
+        update_log("start", error_message)
+    return table, loaded, time.perf_counter() - start
+
+
+@metrics.timed
 def load_data_db(data_payload):
     """
     This calls the readyDropboxFile and the db_to_progress functions to pull
     the files from DB, ready them, and insert into Postgres db. Provide list
-    of the file names (in this case it comes as a dictionary), the dbx instance
-    and the conn connection.
+    of the file names (in this case it comes as a dictionary). The tables are
+    loaded concurrently by load_table, up to pool_size at a time, and one
+    summary line is logged. With load_method "copy" the files are streamed
+    in by copyDropboxFile. Returns the number of tables that failed to load.
     """
-    for key, value in data_payload.items():
-        try:
-            fl = readyDropboxFile(value[0])
-            db_to_postgres(fl, key)
-        except:
-            error_message = (
-                "ERROR: File " + value[0] + " failed to load into table " + key + "."
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        results = list(
+            executor.map(
+                load_table,
+                data_payload.keys(),
+                [value[0] for value in data_payload.values()],
             )
-            update_log("start", error_message)
+        )
+    failed = [table for table, loaded, _ in results if not loaded]
+    summary = ", ".join(
+        "%s %.1fs%s" % (table, seconds, "" if loaded else " FAILED")
+        for table, loaded, seconds in results
+    )
+    update_log("start", "Loaded tables: " + summary)
+    return len(failed)
 
 
 def checkFiles():
@@ -170,20 +630,31 @@ def checkFiles():
     was successful and if not, insert/update error log.
     """
     today = datetime.datetime.now().date()
-    result = dbx.files_list_folder(path="")
-    for i in result.entries:
-        if i.name.endswith(".csv") == True:
-            if i.server_modified.date() - datetime.timedelta(hours=5) == today:
-                print(i.name)
+    for name, modified in store.list():
+        if name.endswith((".csv", ".parquet")) == True:
+            if modified.date() - datetime.timedelta(hours=5) == today:
+                print(name)
             else:
-                print(i.name + " upload date does not match today")
+                print(name + " upload date does not match today")
         else:
             continue
 
 
 def runScriptSQL(sql):
-    cursor = conn.cursor()
-    file = open(sql, "r")
-    cursor.execute(file.read())
-    conn.commit()
-    return cursor.close()
+    """
+    Runs the SQL file as a single transaction, rolling it back on error so
+    a failed script leaves the database as it was.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        file = open(sql, "r")
+        try:
+            with metrics.stage("runScriptSQL " + sql):
+                cursor.execute(file.read())
+                conn.commit()
+        except:
+            conn.rollback()
+            raise
+        finally:
+            file.close()
+        return cursor.close()
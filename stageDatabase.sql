@@ -1,26 +1,12 @@
-DROP TABLE IF EXISTS validboard CASCADE;
+DROP SCHEMA IF EXISTS trello_shadow CASCADE;
 
-DROP TABLE IF EXISTS card CASCADE;
+CREATE SCHEMA trello_shadow;
 
-DROP TABLE IF EXISTS comment CASCADE;
-
-DROP TABLE IF EXISTS checklist CASCADE;
-
-DROP TABLE IF EXISTS field CASCADE;
-
-DROP TABLE IF EXISTS validfieldoption CASCADE;
-
-DROP TABLE IF EXISTS validfield CASCADE;
-
-DROP TABLE IF EXISTS validlabel CASCADE;
-
-DROP TABLE IF EXISTS validlist CASCADE;
-
-DROP TABLE IF EXISTS validmember CASCADE;
+SET LOCAL search_path TO trello_shadow, public;
 
 CREATE TABLE validboard (
     board_name TEXT,
-    board_id TEXT,
+    board_id TEXT PRIMARY KEY,
     board_closed BOOLEAN,
     board_included BOOLEAN,
     board_comment BOOLEAN,
@@ -28,26 +14,28 @@ CREATE TABLE validboard (
 );
 
 CREATE TABLE card (
-    card_id TEXT,
+    card_id TEXT PRIMARY KEY,
     card_creation DATE,
     card_name TEXT,
     card_description TEXT,
     board_id TEXT,
     list_id TEXT,
     card_last_active DATE,
-    label_id TEXT,
-    member_id TEXT,
+    label TEXT[],
+    member TEXT[],
     card_number TEXT,
     card_link TEXT,
     card_url TEXT,
-    card_closed BOOLEAN
+    card_closed BOOLEAN,
+    card_age INTERVAL
 );
 
 CREATE TABLE comment (
     card_id TEXT,
     member_id TEXT,
     card_comment TEXT,
-    comment_date DATE
+    comment_date DATE,
+    comment_id TEXT UNIQUE
 );
 
 CREATE TABLE checklist (
@@ -66,38 +54,39 @@ CREATE TABLE field (
     card_id TEXT,
     field_text TEXT,
     field_value_id TEXT,
-    field_date DATE
+    field_date DATE,
+    field_checked BOOLEAN
 );
 
 CREATE TABLE validfieldoption (
-    field_option_id TEXT,
+    field_option_id TEXT PRIMARY KEY,
     field_option_value TEXT,
     field_option_color TEXT
 );
 
 CREATE TABLE validfield (
-    field_id TEXT,
+    field_id TEXT PRIMARY KEY,
     field_name TEXT,
     board_id TEXT,
     field_type TEXT
 );
 
 CREATE TABLE validlabel (
-    label_id TEXT,
+    label_id TEXT PRIMARY KEY,
     label_name TEXT,
     board_id TEXT,
     label_color TEXT
 );
 
 CREATE TABLE validlist (
-    list_id TEXT,
+    list_id TEXT PRIMARY KEY,
     list_name TEXT,
     board_id TEXT,
     list_closed BOOLEAN
 );
 
 CREATE TABLE validmember (
-    member_id TEXT,
+    member_id TEXT PRIMARY KEY,
     member_name TEXT,
     member_username TEXT
 );
\ No newline at end of file
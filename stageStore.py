@@ -0,0 +1,101 @@
+import dropbox as db
+import os
+import datetime
+
+
+"""
+This script holds the storage backends for the staging environment. Each
+backend reads and writes whole files by a path starting with '/', opens a
+file as a stream for COPY, tells whether a file exists, and lists the staged
+files. DropboxStore is used for the nightly run; LocalStore keeps the files
+in a local folder and can stand in for Dropbox in tests.
+"""
+
+
+class DropboxStore:
+    def __init__(self, access_token):
+        """provide the dropbox access token"""
+        self.dbx = db.Dropbox(access_token)
+
+    def write(self, path, data):
+        """uploads the bytes to the path, overwriting any existing file"""
+        self.dbx.files_upload(f=data, path=path, mode=db.files.WriteMode.overwrite)
+
+    def read(self, path):
+        """downloads the file and returns its bytes"""
+        _, response = self.dbx.files_download(path)
+        response.raise_for_status()
+        return response.content
+
+    def exists(self, path):
+        """returns whether there is a file at the path"""
+        try:
+            self.dbx.files_get_metadata(path)
+        except db.exceptions.ApiError as err:
+            if err.error.is_path() and err.error.get_path().is_not_found():
+                return False
+            raise
+        return True
+
+    def open(self, path):
+        """returns a readable stream of the file without downloading it first"""
+        _, response = self.dbx.files_download(path)
+        response.raw.decode_content = True
+        return response.raw
+
+    def list(self):
+        """returns (file name, modified datetime) for the files in the root"""
+        result = self.dbx.files_list_folder(path="")
+        return [(i.name, i.server_modified) for i in result.entries]
+
+
+class LocalStore:
+    def __init__(self, root):
+        """provide the folder the staged files are kept in"""
+        self.root = root
+
+    def full_path(self, path):
+        """maps a '/' prefixed staging path into the root folder"""
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def write(self, path, data):
+        """writes the bytes to the path, overwriting any existing file"""
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as file:
+            file.write(data)
+
+    def read(self, path):
+        """returns the bytes of the file"""
+        with open(self.full_path(path), "rb") as file:
+            return file.read()
+
+    def exists(self, path):
+        """returns whether there is a file at the path"""
+        return os.path.isfile(self.full_path(path))
+
+    def open(self, path):
+        """returns the file opened for reading"""
+        return open(self.full_path(path), "rb")
+
+    def list(self):
+        """returns (file name, modified datetime) for the files in the root"""
+        return [
+            (
+                i.name,
+                datetime.datetime.fromtimestamp(i.stat().st_mtime),
+            )
+            for i in os.scandir(self.root)
+            if i.is_file()
+        ]
+
+
+def makeStore(backend, access_token=None, root="staging"):
+    """
+    Returns the staging backend named by backend ("dropbox" or "local").
+    """
+    if backend == "dropbox":
+        return DropboxStore(access_token)
+    elif backend == "local":
+        return LocalStore(root)
+    raise ValueError("Unknown staging backend: " + str(backend))
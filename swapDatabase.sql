@@ -0,0 +1,47 @@
+DROP TABLE IF EXISTS public.validboard CASCADE;
+
+DROP TABLE IF EXISTS public.card CASCADE;
+
+DROP TABLE IF EXISTS public.comment CASCADE;
+
+DROP TABLE IF EXISTS public.checklist CASCADE;
+
+DROP TABLE IF EXISTS public.field CASCADE;
+
+DROP TABLE IF EXISTS public.validfieldoption CASCADE;
+
+DROP TABLE IF EXISTS public.validfield CASCADE;
+
+DROP TABLE IF EXISTS public.validlabel CASCADE;
+
+DROP TABLE IF EXISTS public.validlist CASCADE;
+
+DROP TABLE IF EXISTS public.validmember CASCADE;
+
+ALTER TABLE trello_shadow.validboard SET SCHEMA public;
+
+ALTER TABLE trello_shadow.card SET SCHEMA public;
+
+ALTER TABLE trello_shadow.comment SET SCHEMA public;
+
+ALTER TABLE trello_shadow.checklist SET SCHEMA public;
+
+ALTER TABLE trello_shadow.field SET SCHEMA public;
+
+ALTER TABLE trello_shadow.validfieldoption SET SCHEMA public;
+
+ALTER TABLE trello_shadow.validfield SET SCHEMA public;
+
+ALTER TABLE trello_shadow.validlabel SET SCHEMA public;
+
+ALTER TABLE trello_shadow.validlist SET SCHEMA public;
+
+ALTER TABLE trello_shadow.validmember SET SCHEMA public;
+
+DROP SCHEMA trello_shadow;
+
+CALL p_create_views('timetrade');
+
+CALL p_create_views('teambazing');
+
+CALL p_create_views('dsdgisintern');
\ No newline at end of file
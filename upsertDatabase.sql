@@ -0,0 +1,77 @@
+INSERT INTO validboard
+SELECT * FROM validboard_delta
+ON CONFLICT (board_id) DO UPDATE SET
+    board_name = EXCLUDED.board_name,
+    board_closed = EXCLUDED.board_closed,
+    board_included = EXCLUDED.board_included,
+    board_comment = EXCLUDED.board_comment,
+    schema_name = EXCLUDED.schema_name;
+
+INSERT INTO validlist
+SELECT * FROM validlist_delta
+ON CONFLICT (list_id) DO UPDATE SET
+    list_name = EXCLUDED.list_name,
+    board_id = EXCLUDED.board_id,
+    list_closed = EXCLUDED.list_closed;
+
+INSERT INTO validlabel
+SELECT * FROM validlabel_delta
+ON CONFLICT (label_id) DO UPDATE SET
+    label_name = EXCLUDED.label_name,
+    board_id = EXCLUDED.board_id,
+    label_color = EXCLUDED.label_color;
+
+INSERT INTO validmember
+SELECT * FROM validmember_delta
+ON CONFLICT (member_id) DO UPDATE SET
+    member_name = EXCLUDED.member_name,
+    member_username = EXCLUDED.member_username;
+
+INSERT INTO validfield
+SELECT * FROM validfield_delta
+ON CONFLICT (field_id) DO UPDATE SET
+    field_name = EXCLUDED.field_name,
+    board_id = EXCLUDED.board_id,
+    field_type = EXCLUDED.field_type;
+
+INSERT INTO validfieldoption
+SELECT * FROM validfieldoption_delta
+ON CONFLICT (field_option_id) DO UPDATE SET
+    field_option_value = EXCLUDED.field_option_value,
+    field_option_color = EXCLUDED.field_option_color;
+
+INSERT INTO card
+SELECT * FROM card_delta
+ON CONFLICT (card_id) DO UPDATE SET
+    card_name = EXCLUDED.card_name,
+    card_description = EXCLUDED.card_description,
+    board_id = EXCLUDED.board_id,
+    list_id = EXCLUDED.list_id,
+    card_last_active = EXCLUDED.card_last_active,
+    label = EXCLUDED.label,
+    member = EXCLUDED.member,
+    card_number = EXCLUDED.card_number,
+    card_link = EXCLUDED.card_link,
+    card_url = EXCLUDED.card_url,
+    card_closed = EXCLUDED.card_closed,
+    card_age = EXCLUDED.card_age;
+
+UPDATE card
+SET card_age = AGE(card_creation)
+WHERE card_age IS DISTINCT FROM AGE(card_creation);
+
+DELETE FROM checklist
+WHERE card_id IN (SELECT card_id FROM card_delta);
+
+INSERT INTO checklist
+SELECT * FROM checklist_delta;
+
+DELETE FROM field
+WHERE card_id IN (SELECT card_id FROM card_delta);
+
+INSERT INTO field
+SELECT * FROM field_delta;
+
+INSERT INTO comment
+SELECT * FROM comment_delta
+ON CONFLICT (comment_id) DO NOTHING;
\ No newline at end of file